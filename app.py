@@ -1,26 +1,38 @@
 # app.py - Production-ready Flask application with database, Cloudinary, and email services
 import os
+import re
 import json
+import base64
 import logging
+import mimetypes
+from urllib.parse import quote
 from functools import wraps
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
-from flask import Flask, render_template, flash, redirect, url_for, session, request, jsonify
+from flask import Flask, Response, render_template, flash, redirect, url_for, session, request, jsonify, send_from_directory, send_file, abort
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, TextAreaField, SubmitField, PasswordField, SelectField
 from wtforms.validators import DataRequired, Email, Length
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from sqlalchemy import text, tuple_, func
+from sqlalchemy.exc import IntegrityError
 
 # Load environment variables
 load_dotenv()
 
 # Import models and services
-from models import db, ContactMessage, InvestorBooking, PageData, SiteSettings, ContactInfo, UploadedFile
-from database import init_db
-from cloudinary_service import get_cloudinary_service
+from models import db, ContactMessage, InvestorBooking, PageData, SiteSettings, ContactInfo, UploadedFile, EmailOutbox, EmailCampaign, CampaignRecipient
+from database import init_db, get_direct_database_url
+from cloudinary_service import get_cloudinary_service, file_sha256, responsive_image_attrs, video_derivative_urls
+from storage import get_storage
 from email_service import get_email_service
+from email_outbox import enqueue_email, notification_priority, meeting_priority, start_outbox_worker, get_outbox_worker, wake_outbox
+from email_campaigns import SEGMENTS, segment_choices, count_recipients, start_campaign_worker, get_campaign_worker, wake_campaigns
+from countries import COUNTRY_NAMES, COUNTRIES_JSON, COUNTRIES_ETAG, search_countries, canonical_country
+from cache_service import (get_content_cache, get_response_cache, publish_invalidation,
+                           start_invalidation_listener, get_invalidation_listener)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +44,13 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production')
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
+app.config['UPLOAD_BATCH_MAX_FILES'] = int(os.getenv('UPLOAD_BATCH_MAX_FILES', '20'))
+app.config['ADMIN_PAGE_SIZE'] = int(os.getenv('ADMIN_PAGE_SIZE', '50'))  # Rows per page in admin lists
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'mp4', 'webm', 'ogg', 'mov', 'avi', 'pdf'}
+app.config['STATIC_EXPORT_DIR'] = os.getenv('STATIC_EXPORT_DIR')  # Serve public pages pre-rendered by export_static.py
+# Local storage backend (STORAGE_BACKEND=local): hand /media/ file transfers to the web server
+app.config['MEDIA_ACCEL_REDIRECT'] = os.getenv('MEDIA_ACCEL_REDIRECT')  # nginx internal location, e.g. /protected-media/
+app.config['USE_X_SENDFILE'] = os.getenv('MEDIA_X_SENDFILE', 'false').lower() == 'true'  # Apache/lighttpd
 
 # Initialize database
 init_db(app)
@@ -41,43 +59,292 @@ init_db(app)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('data', exist_ok=True)
 
+# Listen for content edits made by other workers (Postgres only)
+CACHE_LISTENER_ENABLED = (
+    os.getenv('CACHE_LISTENER_ENABLED', 'true').lower() == 'true'
+    and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql')
+)
+
+@app.before_request
+def ensure_cache_listener():
+    """Start this worker's cache invalidation listener on its first request."""
+    if CACHE_LISTENER_ENABLED:
+        start_invalidation_listener(get_direct_database_url())
+
+# Deliver queued emails from a background worker pool in each process
+EMAIL_OUTBOX_ENABLED = os.getenv('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+if not EMAIL_OUTBOX_ENABLED:
+    logger.warning("EMAIL_OUTBOX_ENABLED=false: queued emails are only sent by `python email_outbox.py`")
+
+@app.before_request
+def ensure_outbox_worker():
+    """Start this worker's email outbox pool on its first request."""
+    if EMAIL_OUTBOX_ENABLED:
+        start_outbox_worker(app)
+
+# Run queued bulk email campaigns in the background (Postgres only: DISTINCT ON and server-side cursors)
+EMAIL_CAMPAIGNS_ENABLED = (
+    os.getenv('EMAIL_CAMPAIGNS_ENABLED', 'true').lower() == 'true'
+    and app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql')
+)
+
+@app.before_request
+def ensure_campaign_worker():
+    """Start this worker's email campaign runner on its first request."""
+    if EMAIL_CAMPAIGNS_ENABLED:
+        start_campaign_worker(app)
+
+# Public endpoints pre-rendered by export_static.py, and where each one is written
+STATIC_EXPORT_PAGES = {
+    'home': 'index.html',
+    'problem': 'problem/index.html',
+    'solution': 'solution/index.html',
+    'methodology': 'methodology/index.html',
+    'team': 'team/index.html',
+    'get_countries': 'api/countries.json'
+}
+
+@app.before_request
+def serve_static_export():
+    """Serve public pages and hashed assets from the static export when enabled."""
+    export_dir = app.config.get('STATIC_EXPORT_DIR')
+    if not export_dir or request.method not in ('GET', 'HEAD') or request.args:
+        return None
+    
+    if request.endpoint == 'static':
+        # Content-hashed asset names never change, so they can be cached forever
+        filename = request.view_args.get('filename', '')
+        if os.path.isfile(os.path.join(export_dir, 'static', filename)):
+            response = send_from_directory(os.path.join(export_dir, 'static'), filename, max_age=31536000)
+            response.cache_control.immutable = True
+            return response
+        return None
+    
+    path = STATIC_EXPORT_PAGES.get(request.endpoint)
+    if path and os.path.isfile(os.path.join(export_dir, path)):
+        return send_from_directory(export_dir, path, conditional=True)
+    return None
+
 # Admin password hash
 ADMIN_PASSWORD_HASH = generate_password_hash(os.getenv('ADMIN_PASSWORD', 'admin123'))
 
+# Status filters offered in the admin lists
+CONTACT_STATUSES = ('new', 'read', 'replied', 'archived')
+INVESTOR_STATUSES = ('pending', 'confirmed', 'cancelled')
+
 # Helper functions
 def get_countries_list():
     """Get list of all countries for dropdown."""
-    countries = [
-        'United States', 'United Kingdom', 'Canada', 'Australia', 'Germany', 'France', 'Italy', 'Spain',
-        'Netherlands', 'Belgium', 'Switzerland', 'Austria', 'Sweden', 'Norway', 'Denmark', 'Finland',
-        'Poland', 'Portugal', 'Greece', 'Ireland', 'Czech Republic', 'Hungary', 'Romania', 'Bulgaria',
-        'Croatia', 'Slovakia', 'Slovenia', 'Estonia', 'Latvia', 'Lithuania', 'Luxembourg', 'Malta',
-        'Cyprus', 'Japan', 'China', 'India', 'South Korea', 'Singapore', 'Hong Kong', 'Taiwan',
-        'Thailand', 'Malaysia', 'Indonesia', 'Philippines', 'Vietnam', 'New Zealand', 'South Africa',
-        'Brazil', 'Mexico', 'Argentina', 'Chile', 'Colombia', 'Peru', 'Venezuela', 'Uruguay',
-        'Ecuador', 'Panama', 'Costa Rica', 'Guatemala', 'Honduras', 'El Salvador', 'Nicaragua',
-        'Dominican Republic', 'Jamaica', 'Trinidad and Tobago', 'Bahamas', 'Barbados', 'Belize',
-        'Israel', 'United Arab Emirates', 'Saudi Arabia', 'Qatar', 'Kuwait', 'Bahrain', 'Oman',
-        'Jordan', 'Lebanon', 'Egypt', 'Turkey', 'Russia', 'Ukraine', 'Kazakhstan', 'Belarus',
-        'Georgia', 'Armenia', 'Azerbaijan', 'Moldova', 'Albania', 'Bosnia and Herzegovina',
-        'Serbia', 'Montenegro', 'North Macedonia', 'Kosovo', 'Iceland', 'Liechtenstein', 'Monaco',
-        'San Marino', 'Andorra', 'Vatican City', 'Bangladesh', 'Pakistan', 'Sri Lanka', 'Nepal',
-        'Bhutan', 'Myanmar', 'Cambodia', 'Laos', 'Mongolia', 'North Korea', 'Afghanistan',
-        'Iran', 'Iraq', 'Syria', 'Yemen', 'Libya', 'Tunisia', 'Algeria', 'Morocco', 'Sudan',
-        'Ethiopia', 'Kenya', 'Tanzania', 'Uganda', 'Ghana', 'Nigeria', 'Senegal', 'Ivory Coast',
-        'Cameroon', 'Gabon', 'Angola', 'Mozambique', 'Madagascar', 'Mauritius', 'Seychelles',
-        'Botswana', 'Namibia', 'Zimbabwe', 'Zambia', 'Malawi', 'Rwanda', 'Burundi', 'Djibouti',
-        'Eritrea', 'Somalia', 'Chad', 'Niger', 'Mali', 'Burkina Faso', 'Guinea', 'Sierra Leone',
-        'Liberia', 'Togo', 'Benin', 'Gambia', 'Guinea-Bissau', 'Cape Verde', 'São Tomé and Príncipe',
-        'Equatorial Guinea', 'Central African Republic', 'Republic of the Congo', 'Democratic Republic of the Congo',
-        'Other'
-    ]
-    return sorted(countries)
+    return list(COUNTRY_NAMES)
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def normalize_content_hash(value):
+    """Get a SHA-256 hex digest in canonical form, or None if it isn't one."""
+    value = (value or '').strip().lower()
+    return value if re.fullmatch(r'[0-9a-f]{64}', value) else None
+
+def find_uploaded_file(content_hash):
+    """Get the UploadedFile with this content hash, if the same file was uploaded before."""
+    if not content_hash:
+        return None
+    return UploadedFile.query.filter_by(content_hash=content_hash).first()
+
+def mark_files_used(*uploaded_files):
+    """
+    Record that uploaded files were just reused (a deduplicated upload or a library pick).
+    
+    media_gc.py counts its grace period from the later of uploaded_at and
+    last_used_at, so a reused file isn't collected before the page using it
+    is saved.
+    """
+    ids = [uploaded_file.id for uploaded_file in uploaded_files]
+    if not ids:
+        return
+    UploadedFile.query.filter(UploadedFile.id.in_(ids)).update(
+        {UploadedFile.last_used_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+
+def record_uploaded_file(original_filename, url, public_id, file_size=None, content_hash=None):
+    """
+    Save the UploadedFile row for a finished upload.
+    
+    If the same content was recorded in the meantime (content_hash is unique),
+    the just-uploaded asset is deleted (unless it is the recorded asset) and
+    the existing URL is used.
+    
+    Returns:
+        URL to use for the file
+    """
+    storage = get_storage()
+    
+    existing = find_uploaded_file(content_hash)
+    if existing is None:
+        # Videos were uploaded with eager poster and HLS transformations
+        derivatives = video_derivative_urls(url) or {}
+        db.session.add(UploadedFile(
+            original_filename=original_filename[:255],
+            cloudinary_url=url,
+            cloudinary_public_id=public_id,
+            file_type=storage.get_file_type(original_filename),
+            file_size=file_size,
+            content_hash=content_hash,
+            poster_url=derivatives.get('poster_url'),
+            streaming_url=derivatives.get('streaming_url')
+        ))
+        try:
+            db.session.commit()
+            return url
+        except IntegrityError:
+            db.session.rollback()
+            existing = find_uploaded_file(content_hash)
+            if existing is None:
+                raise
+    
+    # Uploads under a content-derived public ID (migrate_media.py) can return the existing asset itself
+    if public_id != existing.cloudinary_public_id:
+        storage.delete(public_id, resource_type=storage.get_resource_type(original_filename))
+    url = existing.cloudinary_url
+    mark_files_used(existing)
+    return url
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row on a page as an opaque, URL-safe cursor."""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor made by encode_cursor.
+    
+    Args:
+        cursor: Cursor string from a previous page
+        *types: Type of each value (datetime, int or str)
+    
+    Returns:
+        Tuple of values, or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return tuple(datetime.fromisoformat(value) if kind is datetime else kind(value)
+                     for value, kind in zip(values, types, strict=True))
+    except (ValueError, TypeError):
+        return None
+
+def keyset_page(query, columns, cursor, limit, descending=True):
+    """
+    Get one page of a query (newest first by default) using keyset pagination.
+    
+    Rather than OFFSET (which reads and discards every earlier row), each page
+    continues from the sort key of the previous page's last row, so with an
+    index on `columns` every page costs the same.
+    
+    Args:
+        query: Filtered query
+        columns: Sort columns, ending in a unique one (e.g. timestamp, id)
+        cursor: Tuple of values from decode_cursor, or None for the first page
+        limit: Rows per page
+        descending: False to page oldest first
+    
+    Returns:
+        Tuple of (rows, next cursor or None on the last page)
+    """
+    if cursor is not None:
+        key = tuple_(*columns)
+        query = query.filter(key < cursor if descending else key > cursor)
+    rows = query.order_by(*[column.desc() if descending else column.asc() for column in columns]).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*[getattr(rows[-1], column.key) for column in columns])
+
+def parse_date_arg(name):
+    """Get a YYYY-MM-DD query argument as a datetime, or None if missing or invalid."""
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def submissions_page(model, statuses, filter_columns=()):
+    """
+    Get one page of form submissions for an admin list, filtered and sorted in SQL.
+    
+    Query args: status, from/to (submission dates, YYYY-MM-DD, inclusive),
+    sort (newest or oldest), cursor (from the previous page) and limit, plus
+    one exact-match arg per filter column. Pages are keyset-paginated on
+    (submitted_at, id), which the models index alone and after status.
+    
+    Args:
+        model: ContactMessage or InvestorBooking
+        statuses: Valid status values
+        filter_columns: Other column names to filter on (e.g. 'country')
+    
+    Returns:
+        dict with 'rows' (to_dict() of each row), 'next_cursor', 'filters'
+        (the active query args, for building links) and 'status_counts'
+    """
+    query = model.query
+    filters = {}
+    
+    status = request.args.get('status', '')
+    if status in statuses:
+        query = query.filter(model.status == status)
+        filters['status'] = status
+    
+    for name in filter_columns:
+        value = request.args.get(name, '').strip()
+        if value:
+            query = query.filter(getattr(model, name) == value)
+            filters[name] = value
+    
+    submitted_from = parse_date_arg('from')
+    if submitted_from:
+        query = query.filter(model.submitted_at >= submitted_from)
+        filters['from'] = request.args['from']
+    submitted_to = parse_date_arg('to')
+    if submitted_to:
+        query = query.filter(model.submitted_at < submitted_to + timedelta(days=1))
+        filters['to'] = request.args['to']
+    
+    descending = request.args.get('sort') != 'oldest'
+    if not descending:
+        filters['sort'] = 'oldest'
+    
+    limit = min(max(request.args.get('limit', app.config['ADMIN_PAGE_SIZE'], type=int), 1), 500)
+    if 'limit' in request.args:
+        filters['limit'] = limit
+    
+    cursor = decode_cursor(request.args.get('cursor'), datetime, int)
+    rows, next_cursor = keyset_page(query, [model.submitted_at, model.id], cursor, limit, descending=descending)
+    
+    return {
+        'rows': [row.to_dict() for row in rows],
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'status_counts': get_status_counts(model)
+    }
+
+def status_counts_key(model):
+    """Get the content cache key of a submissions table's status counts."""
+    return f'status_counts:{model.__tablename__}'
+
+def get_status_counts(model):
+    """
+    Get the number of submissions per status, for the admin stat cards (cached).
+    
+    Counting scans the table, so the result is cached until a submission is
+    added or deleted rather than recounted on every page.
+    """
+    return get_content_cache().get(
+        status_counts_key(model),
+        lambda: dict(db.session.query(model.status, func.count()).group_by(model.status).all())
+    )
+
 def is_video_url(url):
     """Check if URL is a video."""
     if not url:
@@ -87,10 +354,40 @@ def is_video_url(url):
     video_domains = ['youtube.com', 'youtu.be', 'vimeo.com']
     return any(url_lower.endswith(ext) for ext in video_extensions) or any(domain in url_lower for domain in video_domains)
 
+def video_sources(urls):
+    """
+    Get the poster and streaming URLs of the uploaded videos among slider URLs.
+    
+    Args:
+        urls: Slider media URLs
+    
+    Returns:
+        dict mapping each video URL to {'poster_url', 'streaming_url'}; videos not
+        uploaded through the admin only get a poster derived from their Cloudinary URL
+    """
+    video_urls = [url for url in urls if is_video_url(url)]
+    if not video_urls:
+        return {}
+    
+    sources = {}
+    for url in video_urls:
+        derived = video_derivative_urls(url)
+        if derived:
+            sources[url] = {'poster_url': derived['poster_url'], 'streaming_url': None}
+    
+    # HLS renditions are only offered where they were generated at upload time
+    rows = UploadedFile.query.filter(UploadedFile.cloudinary_url.in_(video_urls)).all()
+    for row in rows:
+        sources[row.cloudinary_url] = {
+            'poster_url': row.poster_url or sources.get(row.cloudinary_url, {}).get('poster_url'),
+            'streaming_url': row.streaming_url
+        }
+    return sources
+
 @app.context_processor
 def utility_processor():
     """Make utility functions available in templates."""
-    return dict(is_video_url=is_video_url)
+    return dict(is_video_url=is_video_url, image_attrs=responsive_image_attrs, video_sources=video_sources)
 
 def admin_required(f):
     """Decorator to require admin authentication."""
@@ -102,13 +399,60 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def cached_page(page_name):
+    """
+    Decorator to serve a public page from the rendered-response cache.
+
+    The wrapped view is only called when the page hasn't been rendered for the
+    current content version. Responses carry a strong ETag and Last-Modified,
+    and matching conditional GETs are answered with 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response_cache = get_response_cache()
+            if not response_cache.enabled:
+                return f(*args, **kwargs)
+            
+            # The rendered page depends on its own content and the site settings
+            content_cache = get_content_cache()
+            keys = (f'page:{page_name}', 'site_settings')
+            version = content_cache.version_of(*keys)
+            entry = response_cache.get(page_name, version)
+            if entry is None:
+                entry = response_cache.set(
+                    page_name,
+                    version,
+                    f(*args, **kwargs),
+                    last_modified=content_cache.last_modified(*keys)
+                )
+            
+            response = Response(entry['body'], mimetype='text/html')
+            response.set_etag(entry['etag'])
+            if entry['last_modified']:
+                response.last_modified = entry['last_modified']
+            response.cache_control.public = True
+            response.cache_control.no_cache = True
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                response_cache.record_not_modified()
+            return response
+        return decorated_function
+    return decorator
+
 # Database helper functions
 def get_page_data(page_name):
-    """Get page data from database."""
+    """Get page data (cached)."""
+    return get_content_cache().get(f'page:{page_name}', lambda: _load_page_data(page_name))
+
+def _load_page_data(page_name):
+    """Load page data from database."""
     page = PageData.query.filter_by(page_name=page_name).first()
-    if page:
-        return page.content if isinstance(page.content, dict) else json.loads(page.content) if isinstance(page.content, str) else {}
-    return {}
+    return _page_content(page.content) if page else {}
+
+def _page_content(content):
+    """Normalize stored page content to a dict."""
+    return content if isinstance(content, dict) else json.loads(content) if isinstance(content, str) else {}
 
 def save_page_data(page_name, content):
     """Save page data to database."""
@@ -119,19 +463,17 @@ def save_page_data(page_name, content):
     else:
         page = PageData(page_name=page_name, content=content)
         db.session.add(page)
+    publish_invalidation(f'page:{page_name}')
     db.session.commit()
+    get_content_cache().invalidate(f'page:{page_name}')
 
 def get_site_settings():
-    """Get site settings from database."""
-    settings = {}
-    site_settings = SiteSettings.query.all()
-    for setting in site_settings:
-        try:
-            value = json.loads(setting.value) if setting.value else None
-        except:
-            value = setting.value
-        settings[setting.key] = value
-    
+    """Get site settings (cached), with defaults for missing keys."""
+    settings = get_content_cache().get('site_settings', _load_site_settings)
+    return _site_settings_with_defaults(settings)
+
+def _site_settings_with_defaults(settings):
+    """Fill in default values for missing site settings."""
     # Defaults
     defaults = {
         'logo_type': 'text',
@@ -147,6 +489,18 @@ def get_site_settings():
     
     return settings
 
+def _load_site_settings():
+    """Load site settings from database."""
+    site_settings = SiteSettings.query.all()
+    return {setting.key: _parse_setting_value(setting.value) for setting in site_settings}
+
+def _parse_setting_value(value):
+    """Decode a stored site setting value."""
+    try:
+        return json.loads(value) if value else None
+    except:
+        return value
+
 def save_site_setting(key, value):
     """Save a site setting to database."""
     setting = SiteSettings.query.filter_by(key=key).first()
@@ -159,25 +513,87 @@ def save_site_setting(key, value):
             value=json.dumps(value) if isinstance(value, (dict, list)) else str(value)
         )
         db.session.add(setting)
+    publish_invalidation('site_settings')
     db.session.commit()
+    get_content_cache().invalidate('site_settings')
 
 def get_contact_info():
-    """Get contact information from database."""
+    """Get contact information (cached)."""
+    return get_content_cache().get('contact_info', _load_contact_info)
+
+def _load_contact_info():
+    """Load contact information from database."""
     contact = ContactInfo.query.first()
-    if contact:
-        return {
-            'address': contact.address or '1 Tesla Road, Austin, TX 78725, USA',
-            'email': contact.email or 'info@tesla.com',
-            'phone': contact.phone or '+1 (512) 516-8177',
-            'map_url': contact.map_url or 'https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d3447.332309852891!2d-97.61868468487999!3d30.22744388181669!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x8644b0d1b91350c3%3A0x651c633a5b6f707!2sTesla%20Giga%20Texas!5e0!3m2!1sen!2sus!4v1678888888888!5m2!1sen!2sus'
-        }
+    return _contact_info_with_defaults(contact.to_dict() if contact else None)
+
+def _contact_info_with_defaults(contact):
+    """Fill in default contact details for missing fields."""
+    contact = contact or {}
     return {
-        'address': '1 Tesla Road, Austin, TX 78725, USA',
-        'email': 'info@tesla.com',
-        'phone': '+1 (512) 516-8177',
-        'map_url': 'https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d3447.332309852891!2d-97.61868468487999!3d30.22744388181669!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x8644b0d1b91350c3%3A0x651c633a5b6f707!2sTesla%20Giga%20Texas!5e0!3m2!1sen!2sus!4v1678888888888!5m2!1sen!2sus'
+        'address': contact.get('address') or '1 Tesla Road, Austin, TX 78725, USA',
+        'email': contact.get('email') or 'info@tesla.com',
+        'phone': contact.get('phone') or '+1 (512) 516-8177',
+        'map_url': contact.get('map_url') or 'https://www.google.com/maps/embed?pb=!1m18!1m12!1m3!1d3447.332309852891!2d-97.61868468487999!3d30.22744388181669!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1!3m3!1m2!1s0x8644b0d1b91350c3%3A0x651c633a5b6f707!2sTesla%20Giga%20Texas!5e0!3m2!1sen!2sus!4v1678888888888!5m2!1sen!2sus'
     }
 
+# Each subquery is only included when its key isn't already cached
+ROUTE_CONTEXT_QUERIES = {
+    'page': "(SELECT content FROM page_data WHERE page_name = :page_name) AS page",
+    'site_settings': "(SELECT json_object_agg(key, value) FROM site_settings) AS site_settings",
+    'contact_info': (
+        "(SELECT row_to_json(c) FROM (SELECT address, email, phone, map_url "
+        "FROM contact_info ORDER BY id LIMIT 1) c) AS contact_info"
+    )
+}
+
+def get_route_context(page_name=None, include_contact=False):
+    """
+    Get everything a route needs: page data, site settings and contact info.
+    
+    Cached values are served from the content cache; whatever is missing is
+    fetched in a single SQL statement instead of one query per table.
+    
+    Args:
+        page_name: Page whose data to include (None to skip)
+        include_contact: Whether to include contact info
+    
+    Returns:
+        dict with 'site_settings' and, when requested, 'page_data' and 'contact_info'
+    """
+    keys = ['site_settings']
+    if page_name:
+        keys.append(f'page:{page_name}')
+    if include_contact:
+        keys.append('contact_info')
+    
+    values = get_content_cache().get_many(keys, lambda missing: _load_route_context(missing, page_name))
+    
+    context = {'site_settings': _site_settings_with_defaults(values['site_settings'])}
+    if page_name:
+        context['page_data'] = values[f'page:{page_name}']
+    if include_contact:
+        context['contact_info'] = values['contact_info']
+    return context
+
+def _load_route_context(keys, page_name=None):
+    """Load the given content cache keys from the database in one round trip."""
+    columns = [
+        ROUTE_CONTEXT_QUERIES['page' if key.startswith('page:') else key]
+        for key in keys
+    ]
+    params = {'page_name': page_name} if any(key.startswith('page:') for key in keys) else {}
+    row = db.session.execute(text(f"SELECT {', '.join(columns)}"), params).mappings().first()
+    
+    values = {}
+    for key in keys:
+        if key.startswith('page:'):
+            values[key] = _page_content(row['page']) if row['page'] is not None else {}
+        elif key == 'site_settings':
+            values[key] = {k: _parse_setting_value(v) for k, v in (row['site_settings'] or {}).items()}
+        elif key == 'contact_info':
+            values[key] = _contact_info_with_defaults(row['contact_info'])
+    return values
+
 def save_contact_info(address, email, phone, map_url):
     """Save contact information to database."""
     contact = ContactInfo.query.first()
@@ -190,44 +606,46 @@ def save_contact_info(address, email, phone, map_url):
     else:
         contact = ContactInfo(address=address, email=email, phone=phone, map_url=map_url)
         db.session.add(contact)
+    publish_invalidation('contact_info')
     db.session.commit()
+    get_content_cache().invalidate('contact_info')
 
 # Routes
 @app.route('/')
+@cached_page('index')
 def home():
     """Serves the main page."""
-    page_data = get_page_data('index')
-    site_settings = get_site_settings()
-    return render_template('index.html', page_data=page_data, site_settings=site_settings)
+    context = get_route_context('index')
+    return render_template('index.html', **context)
 
 @app.route('/problem')
+@cached_page('problem')
 def problem():
     """Serves the Problem page."""
-    page_data = get_page_data('problem')
-    site_settings = get_site_settings()
-    return render_template('problem.html', page_data=page_data, site_settings=site_settings)
+    context = get_route_context('problem')
+    return render_template('problem.html', **context)
 
 @app.route('/solution')
+@cached_page('solution')
 def solution():
     """Serves the Solution page."""
-    page_data = get_page_data('solution')
-    site_settings = get_site_settings()
-    return render_template('solution.html', page_data=page_data, site_settings=site_settings)
+    context = get_route_context('solution')
+    return render_template('solution.html', **context)
 
 @app.route('/methodology')
+@cached_page('methodology')
 def methodology():
     """Serves the Methodology page."""
-    page_data = get_page_data('methodology')
-    site_settings = get_site_settings()
-    return render_template('methodology.html', page_data=page_data, site_settings=site_settings)
+    context = get_route_context('methodology')
+    return render_template('methodology.html', **context)
 
 @app.route('/team')
+@cached_page('team')
 def team():
     """Serves the Team page."""
-    page_data = get_page_data('team')
-    team_data = page_data.get('members', []) if page_data else []
-    site_settings = get_site_settings()
-    return render_template('team.html', team=team_data, page_data=page_data, site_settings=site_settings)
+    context = get_route_context('team')
+    team_data = context['page_data'].get('members', []) if context['page_data'] else []
+    return render_template('team.html', team=team_data, **context)
 
 # Contact form
 class ContactForm(FlaskForm):
@@ -241,8 +659,8 @@ class ContactForm(FlaskForm):
 def contact():
     """Serves the Contact page."""
     form = ContactForm()
-    site_settings = get_site_settings()
-    contact_info = get_contact_info()
+    context = get_route_context(include_contact=True)
+    site_settings = context['site_settings']
     
     if form.validate_on_submit():
         # Create message record
@@ -254,17 +672,23 @@ def contact():
             status='new'
         )
         db.session.add(contact_message)
-        db.session.commit()
+        db.session.flush()  # Assign ID and timestamps for the email bodies
+        publish_invalidation(status_counts_key(ContactMessage))
         
-        # Send emails
+        # Queue emails in the same transaction; the outbox worker sends them
         email_service = get_email_service()
-        email_service.send_contact_notification(contact_message)
-        email_service.send_contact_confirmation(contact_message, from_email=site_settings.get('from_email'))
+        enqueue_email(email_service.build_contact_notification(contact_message), kind='contact_notification',
+                      priority=notification_priority(contact_message.subject, contact_message.message))
+        enqueue_email(email_service.build_contact_confirmation(contact_message, from_email=site_settings.get('from_email')),
+                      kind='contact_confirmation')
+        db.session.commit()
+        get_content_cache().invalidate(status_counts_key(ContactMessage))
+        wake_outbox()
         
         flash('Your message has been sent successfully.', 'success')
         return redirect(url_for('contact'))
     
-    return render_template('contact.html', form=form, site_settings=site_settings, contact_info=contact_info)
+    return render_template('contact.html', form=form, **context)
 
 # Admin routes
 class LoginForm(FlaskForm):
@@ -277,6 +701,12 @@ class EmailForm(FlaskForm):
     html_content = TextAreaField('HTML Content', validators=[DataRequired("Please enter email content."), Length(min=1, max=10000)])
     submit = SubmitField('Send Email')
 
+class CampaignForm(FlaskForm):
+    segment = SelectField('Recipients', choices=segment_choices(), validators=[DataRequired("Please choose the recipients.")])
+    subject = StringField('Subject', validators=[DataRequired("Please enter a subject."), Length(min=1, max=200)])
+    html_content = TextAreaField('HTML Content', validators=[DataRequired("Please enter email content."), Length(min=1, max=10000)])
+    submit = SubmitField('Start Campaign')
+
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     """Admin login page."""
@@ -353,8 +783,6 @@ def get_default_page_data(page_name):
 @admin_required
 def admin_edit_page(page_name):
     """Edit a specific page."""
-    site_settings = get_site_settings()
-    
     # Validate page name
     valid_pages = ['index', 'problem', 'solution', 'methodology', 'team']
     if page_name not in valid_pages:
@@ -426,7 +854,9 @@ def admin_edit_page(page_name):
         return redirect(url_for('admin_dashboard'))
     
     # GET request - load page data or use defaults
-    page_data = get_page_data(page_name)
+    context = get_route_context(page_name)
+    site_settings = context['site_settings']
+    page_data = context['page_data']
     if not page_data:
         # Create default page data if it doesn't exist
         page_data = get_default_page_data(page_name)
@@ -438,8 +868,22 @@ def admin_edit_page(page_name):
 @app.route('/admin/upload', methods=['POST'])
 @admin_required
 def admin_upload():
-    """Handle file uploads to Cloudinary."""
+    """
+    Handle file uploads to the storage backend (Cloudinary unless STORAGE_BACKEND=local).
+    
+    Besides multipart form uploads, accepts the file as a raw
+    application/octet-stream body (filename in X-Filename), which is streamed
+    to storage in chunks without buffering it. A failed raw upload returns a
+    'resume' token; send the rest of the file from resume.offset with the token
+    in X-Upload-Resume (JSON) and X-File-Size set to the full size.
+    
+    Files are deduplicated by SHA-256: known content is answered with the
+    existing URL and 'duplicate': true, without uploading it again.
+    """
     try:
+        if request.mimetype == 'application/octet-stream':
+            return admin_upload_stream()
+        
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
         
@@ -451,23 +895,22 @@ def admin_upload():
             file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
             return jsonify({'error': f'Invalid file type: .{file_ext}. Allowed types: {", ".join(sorted(app.config["ALLOWED_EXTENSIONS"]))}'}), 400
         
-        # Upload to Cloudinary
-        cloudinary_service = get_cloudinary_service()
-        result = cloudinary_service.upload_any_file(file)
+        # Same content uploaded before: reuse it without going to Cloudinary
+        content_hash = file_sha256(file)
+        existing = find_uploaded_file(content_hash)
+        if existing is not None:
+            url = existing.cloudinary_url
+            mark_files_used(existing)
+            return jsonify({'url': url, 'duplicate': True})
+        
+        # Upload to the storage backend (Cloudinary unless STORAGE_BACKEND says otherwise)
+        result = get_storage().save(file, folder='uploads/files')
         
         if result.get('success'):
             # Save to database
-            uploaded_file = UploadedFile(
-                original_filename=file.filename,
-                cloudinary_url=result['url'],
-                cloudinary_public_id=result['public_id'],
-                file_type=cloudinary_service.get_file_type(file.filename),
-                file_size=result.get('bytes')
-            )
-            db.session.add(uploaded_file)
-            db.session.commit()
-            
-            return jsonify({'url': result['url']})
+            url = record_uploaded_file(file.filename, result['url'], result['public_id'],
+                                       file_size=result.get('bytes'), content_hash=content_hash)
+            return jsonify({'url': url})
         else:
             return jsonify({'error': result.get('error', 'Upload failed')}), 500
     
@@ -477,6 +920,221 @@ def admin_upload():
         traceback.print_exc()
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+def admin_upload_stream():
+    """Stream a raw request body to storage in chunks (see admin_upload)."""
+    filename = request.headers.get('X-Filename', '')
+    if not filename:
+        return jsonify({'error': 'X-Filename header is required'}), 400
+    
+    if not allowed_file(filename):
+        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        return jsonify({'error': f'Invalid file type: .{file_ext}. Allowed types: {", ".join(sorted(app.config["ALLOWED_EXTENSIONS"]))}'}), 400
+    
+    # A client that sends the hash up front skips the upload entirely for known content
+    declared_hash = normalize_content_hash(request.headers.get('X-Content-SHA256'))
+    existing = find_uploaded_file(declared_hash)
+    if existing is not None:
+        url = existing.cloudinary_url
+        mark_files_used(existing)
+        return jsonify({'url': url, 'duplicate': True})
+    
+    resume = json.loads(request.headers['X-Upload-Resume']) if request.headers.get('X-Upload-Resume') else None
+    file_size = int(request.headers.get('X-File-Size') or request.content_length or 0)
+    
+    result = get_storage().save_stream(
+        request.stream,
+        filename,
+        folder='uploads/files',
+        file_size=file_size,
+        resume=resume
+    )
+    
+    if not result.get('success'):
+        return jsonify({'error': result.get('error', 'Upload failed'), 'resume': result.get('resume')}), 500
+    
+    url = record_uploaded_file(filename, result['url'], result['public_id'], file_size=file_size,
+                               content_hash=result.get('content_hash') or declared_hash)
+    return jsonify({'url': url})
+
+@app.route('/admin/upload/batch', methods=['POST'])
+@admin_required
+def admin_upload_batch():
+    """
+    Upload several files (multipart field 'files') to storage concurrently.
+    
+    The admin pages upload several files straight to Cloudinary from the
+    browser; this is their fallback for backends without direct uploads.
+    
+    Uploads run on the bounded pool shared by every request, so a batch takes
+    about as long as its slowest file. Known content is deduplicated as in
+    admin_upload, and a file sent twice in one batch is uploaded once.
+    
+    Returns:
+        {'results': [...]} with one {'filename', 'url'} (plus 'duplicate') or
+        {'filename', 'error'} per file, in the order the files were sent
+    """
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    if len(files) > app.config['UPLOAD_BATCH_MAX_FILES']:
+        return jsonify({'error': f'At most {app.config["UPLOAD_BATCH_MAX_FILES"]} files per upload'}), 400
+    
+    try:
+        results = [None] * len(files)
+        hashes = {}
+        for index, file in enumerate(files):
+            if allowed_file(file.filename):
+                hashes[index] = file_sha256(file)
+            else:
+                file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+                results[index] = {'filename': file.filename, 'error': f'Invalid file type: .{file_ext}'}
+        
+        # Same content uploaded before: reuse it without going to Cloudinary
+        existing = {}
+        if hashes:
+            rows = UploadedFile.query.filter(UploadedFile.content_hash.in_(set(hashes.values()))).all()
+            existing = {row.content_hash: row.cloudinary_url for row in rows}
+            mark_files_used(*rows)
+        
+        pending = {}  # Content hash -> indexes of the files with that content
+        for index, content_hash in hashes.items():
+            if content_hash in existing:
+                results[index] = {'filename': files[index].filename, 'url': existing[content_hash], 'duplicate': True}
+            else:
+                pending.setdefault(content_hash, []).append(index)
+        
+        uploads = get_storage().save_many([files[indexes[0]] for indexes in pending.values()])
+        
+        for (content_hash, indexes), result in zip(pending.items(), uploads):
+            first = files[indexes[0]]
+            if result.get('success'):
+                url = record_uploaded_file(first.filename, result['url'], result['public_id'],
+                                           file_size=result.get('bytes'), content_hash=content_hash)
+                outcome = {'url': url}
+            else:
+                outcome = {'error': result.get('error', 'Upload failed')}
+            for index in indexes:
+                results[index] = {'filename': files[index].filename, **outcome}
+        
+        return jsonify({'results': results})
+    
+    except Exception as e:
+        logger.error(f"Batch upload error: {e}")
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@app.route('/admin/upload/sign', methods=['POST'])
+@admin_required
+def admin_upload_sign():
+    """
+    Issue signed parameters for uploading a file straight from the browser to Cloudinary.
+    
+    The file never passes through this app; the browser calls
+    /admin/upload/complete with Cloudinary's response afterwards.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    
+    if not filename:
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not allowed_file(filename):
+        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        return jsonify({'error': f'Invalid file type: .{file_ext}. Allowed types: {", ".join(sorted(app.config["ALLOWED_EXTENSIONS"]))}'}), 400
+    
+    # Same content uploaded before: the browser can use it without uploading
+    existing = find_uploaded_file(normalize_content_hash(data.get('content_hash')))
+    if existing is not None:
+        url = existing.cloudinary_url
+        mark_files_used(existing)
+        return jsonify({'url': url, 'duplicate': True})
+    
+    # Backends without direct uploads (local storage): the browser posts the file to /admin/upload
+    if not get_storage().supports_direct_upload:
+        return jsonify({'direct_upload': False})
+    
+    try:
+        cloudinary_service = get_cloudinary_service()
+        return jsonify(cloudinary_service.sign_upload(filename, folder='uploads/files', file_size=data.get('size')))
+    except Exception as e:
+        logger.error(f"Upload signing error: {e}")
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@app.route('/admin/upload/complete', methods=['POST'])
+@admin_required
+def admin_upload_complete():
+    """Record a direct upload once the browser has Cloudinary's (signed) response."""
+    data = request.get_json(silent=True) or {}
+    
+    required_fields = ['public_id', 'version', 'signature', 'resource_type', 'original_filename']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({'error': f'{field} is required'}), 400
+    
+    if data['resource_type'] not in ('image', 'video', 'raw'):
+        return jsonify({'error': 'Invalid resource type'}), 400
+    
+    cloudinary_service = get_cloudinary_service()
+    url = cloudinary_service.verify_upload(
+        data['public_id'],
+        data['version'],
+        data['signature'],
+        resource_type=data['resource_type'],
+        format=data.get('format')
+    )
+    if not url:
+        return jsonify({'error': 'Upload could not be verified'}), 400
+    
+    url = record_uploaded_file(data['original_filename'], url, data['public_id'], file_size=data.get('bytes'),
+                               content_hash=normalize_content_hash(data.get('content_hash')))
+    return jsonify({'url': url})
+
+@app.route('/admin/media')
+@admin_required
+def admin_media():
+    """
+    Media library: uploaded files, newest first, for picking in the page editors.
+    
+    Query args: type (image, video, pdf, other), q (filename search), from/to
+    (upload dates, YYYY-MM-DD, inclusive), cursor (from the previous page's
+    next_cursor) and limit.
+    """
+    query = UploadedFile.query
+    
+    file_type = request.args.get('type')
+    if file_type:
+        query = query.filter(UploadedFile.file_type == file_type)
+    
+    search = request.args.get('q', '').strip()
+    if search:
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(UploadedFile.original_filename.ilike(f'%{escaped}%', escape='\\'))
+    
+    uploaded_from = parse_date_arg('from')
+    if uploaded_from:
+        query = query.filter(UploadedFile.uploaded_at >= uploaded_from)
+    uploaded_to = parse_date_arg('to')
+    if uploaded_to:
+        query = query.filter(UploadedFile.uploaded_at < uploaded_to + timedelta(days=1))
+    
+    limit = min(max(request.args.get('limit', 48, type=int), 1), 100)
+    cursor = decode_cursor(request.args.get('cursor'), datetime, int)
+    files, next_cursor = keyset_page(query, [UploadedFile.uploaded_at, UploadedFile.id], cursor, limit)
+    
+    return jsonify({
+        'items': [uploaded_file.to_dict() for uploaded_file in files],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/admin/media/<int:file_id>/use', methods=['POST'])
+@admin_required
+def admin_media_use(file_id):
+    """Record that a file was picked from the media library (see mark_files_used)."""
+    uploaded_file = db.session.get(UploadedFile, file_id)
+    if uploaded_file is None:
+        return jsonify({'error': 'File not found'}), 404
+    mark_files_used(uploaded_file)
+    return jsonify({'success': True})
+
 @app.route('/admin/settings', methods=['GET', 'POST'])
 @admin_required
 def admin_settings():
@@ -512,12 +1170,88 @@ def admin_send_email():
         
         if result.get('success'):
             flash(f'Email sent successfully to {form.to_email.data}! (ID: {result.get("email_id", "N/A")})', 'success')
+        elif result.get('circuit_open'):
+            # The email provider is failing; hand the message to the outbox to send once it recovers
+            enqueue_email({
+                'to': form.to_email.data,
+                'subject': form.subject.data,
+                'html': form.html_content.data,
+                'from': site_settings.get('from_email')
+            }, kind='admin_email')
+            db.session.commit()
+            flash(f'The email provider is currently unavailable. Your email to {form.to_email.data} has been queued and will be sent automatically.', 'success')
         else:
             flash(f'Error sending email: {result.get("error", "Unknown error")}', 'error')
         
         return redirect(url_for('admin_send_email'))
     
-    return render_template('admin/send_email.html', form=form, site_settings=site_settings)
+    campaign_form = CampaignForm(prefix='campaign')
+    campaigns = EmailCampaign.query.order_by(EmailCampaign.created_at.desc()).limit(10).all()
+    return render_template('admin/send_email.html', form=form, campaign_form=campaign_form,
+                           campaigns=[campaign.to_dict() for campaign in campaigns],
+                           segments={key: label for key, (label, source, status) in SEGMENTS.items()},
+                           site_settings=site_settings)
+
+@app.route('/admin/campaigns', methods=['POST'])
+@admin_required
+def admin_create_campaign():
+    """Queue a bulk email to a segment; the campaign runner sends it in the background."""
+    form = CampaignForm(prefix='campaign')
+    
+    if not form.validate_on_submit():
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f'Campaign: {error}', 'error')
+        return redirect(url_for('admin_send_email'))
+    
+    total = count_recipients(form.segment.data)
+    if not total:
+        flash('No recipients in that segment.', 'error')
+        return redirect(url_for('admin_send_email'))
+    
+    campaign = EmailCampaign(
+        segment=form.segment.data,
+        subject=form.subject.data,
+        html_content=form.html_content.data,
+        from_email=get_site_settings().get('from_email'),
+        status='queued',
+        total=total
+    )
+    db.session.add(campaign)
+    db.session.commit()
+    wake_campaigns()
+    
+    flash(f'Campaign queued for {total} recipients. Progress is shown below.', 'success')
+    return redirect(url_for('admin_send_email'))
+
+@app.route('/admin/campaigns/<int:campaign_id>')
+@admin_required
+def admin_campaign_progress(campaign_id):
+    """Campaign progress and its most recent failures, polled by the send email page."""
+    campaign = EmailCampaign.query.get_or_404(campaign_id)
+    failures = (CampaignRecipient.query
+                .filter_by(campaign_id=campaign_id, status='failed')
+                .order_by(CampaignRecipient.id.desc())
+                .limit(20)
+                .all())
+    worker = get_campaign_worker()
+    return jsonify({
+        'campaign': campaign.to_dict(),
+        'failures': [recipient.to_dict() for recipient in failures],
+        'worker': worker.stats() if worker else None
+    })
+
+@app.route('/admin/campaigns/<int:campaign_id>/cancel', methods=['POST'])
+@admin_required
+def admin_cancel_campaign(campaign_id):
+    """Cancel a queued or running campaign; the runner stops after its in-flight batches."""
+    campaign = EmailCampaign.query.get_or_404(campaign_id)
+    if campaign.status in ('queued', 'running'):
+        campaign.status = 'cancelled'
+        if campaign.started_at is None:
+            campaign.finished_at = datetime.utcnow()
+        db.session.commit()
+    return jsonify({'success': True, 'campaign': campaign.to_dict()})
 
 @app.route('/api/investor-booking', methods=['POST'])
 def investor_booking():
@@ -545,24 +1279,35 @@ def investor_booking():
         if len(phone) < 7:
             return jsonify({'success': False, 'error': 'Invalid phone number (must be at least 7 digits)'}), 400
         
+        # Validate country against the list, storing its canonical name so filters match exactly
+        country = canonical_country(str(data['country']))
+        if country is None:
+            return jsonify({'success': False, 'error': 'Please choose a country from the list', 'field': 'country'}), 400
+        
         # Create booking record
         investor_booking = InvestorBooking(
             full_name=data['full_name'],
             email=data['email'],
             phone=data['phone'],
-            country=data['country'],
+            country=country,
             meeting_date=data['meeting_date'],
             platform=data['platform'],
             status='pending'
         )
         db.session.add(investor_booking)
-        db.session.commit()
+        db.session.flush()  # Assign ID and timestamps for the email bodies
+        publish_invalidation(status_counts_key(InvestorBooking))
         
-        # Send emails
+        # Queue emails in the same transaction; the outbox worker sends them
         site_settings = get_site_settings()
         email_service = get_email_service()
-        email_service.send_investor_notification(investor_booking)
-        email_service.send_investor_confirmation(investor_booking, from_email=site_settings.get('from_email'))
+        enqueue_email(email_service.build_investor_notification(investor_booking), kind='investor_notification',
+                      priority=meeting_priority(investor_booking.meeting_date))
+        enqueue_email(email_service.build_investor_confirmation(investor_booking, from_email=site_settings.get('from_email')),
+                      kind='investor_confirmation')
+        db.session.commit()
+        get_content_cache().invalidate(status_counts_key(InvestorBooking))
+        wake_outbox()
         
         return jsonify({'success': True, 'message': 'Thank you! Your meeting request has been received.'})
     
@@ -575,26 +1320,71 @@ def investor_booking():
 @app.route('/admin/investors')
 @admin_required
 def admin_investors():
-    """Admin page to view all investor bookings."""
-    investors = InvestorBooking.query.order_by(InvestorBooking.submitted_at.desc()).all()
+    """Admin page to view investor bookings, a page at a time (see submissions_page for the query args)."""
+    page = submissions_page(InvestorBooking, INVESTOR_STATUSES, filter_columns=('country',))
     site_settings = get_site_settings()
-    investors_data = [inv.to_dict() for inv in investors]
-    return render_template('admin/investors.html', investors=investors_data, site_settings=site_settings)
+    return render_template('admin/investors.html', investors=page['rows'], next_cursor=page['next_cursor'],
+                           filters=page['filters'], status_counts=page['status_counts'],
+                           statuses=INVESTOR_STATUSES, countries=COUNTRY_NAMES, site_settings=site_settings)
 
 @app.route('/api/countries')
 def get_countries():
-    """API endpoint to get list of countries."""
-    return jsonify(get_countries_list())
+    """
+    API endpoint to get list of countries.
+    
+    With ?q=<prefix>, returns matching countries as [{"name", "code"}] for typeahead.
+    Both forms are pre-encoded at import and served with an ETag.
+    """
+    if 'q' in request.args:
+        body, etag = search_countries(request.args.get('q'))
+    else:
+        body, etag = COUNTRIES_JSON, COUNTRIES_ETAG
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 7 * 24 * 3600  # Only changes on deploy
+    return response.make_conditional(request)
+
+@app.route('/media/<path:filename>')
+def media(filename):
+    """
+    Serve files kept by the local storage backend.
+    
+    Stored files never change (every upload gets a new name), so they are
+    cached as immutable. With MEDIA_ACCEL_REDIRECT set, nginx sends the bytes
+    (X-Accel-Redirect); with MEDIA_X_SENDFILE, Apache or lighttpd do
+    (X-Sendfile). Otherwise the worker streams the file itself, answering
+    Range and conditional requests.
+    """
+    try:
+        path = get_storage('local').path(filename)
+    except ValueError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    accel_prefix = app.config['MEDIA_ACCEL_REDIRECT']
+    if accel_prefix:
+        response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(filename)
+    else:
+        response = send_file(path, conditional=True, max_age=31536000)
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/admin/contact')
 @admin_required
 def admin_contact():
-    """Admin page to view and manage contact messages."""
-    messages = ContactMessage.query.order_by(ContactMessage.submitted_at.desc()).all()
-    site_settings = get_site_settings()
-    contact_info = get_contact_info()
-    messages_data = [msg.to_dict() for msg in messages]
-    return render_template('admin/contact.html', messages=messages_data, site_settings=site_settings, contact_info=contact_info)
+    """Admin page to view and manage contact messages, a page at a time (see submissions_page for the query args)."""
+    page = submissions_page(ContactMessage, CONTACT_STATUSES)
+    context = get_route_context(include_contact=True)
+    return render_template('admin/contact.html', messages=page['rows'], next_cursor=page['next_cursor'],
+                           filters=page['filters'], status_counts=page['status_counts'],
+                           statuses=CONTACT_STATUSES, **context)
 
 @app.route('/admin/contact/delete/<int:message_id>', methods=['POST'])
 @admin_required
@@ -602,7 +1392,9 @@ def admin_delete_contact_message(message_id):
     """Delete a contact message."""
     message = ContactMessage.query.get_or_404(message_id)
     db.session.delete(message)
+    publish_invalidation(status_counts_key(ContactMessage))
     db.session.commit()
+    get_content_cache().invalidate(status_counts_key(ContactMessage))
     flash('Message deleted successfully.', 'success')
     return redirect(url_for('admin_contact'))
 
@@ -610,8 +1402,6 @@ def admin_delete_contact_message(message_id):
 @admin_required
 def admin_contact_info():
     """Admin page to edit contact information."""
-    site_settings = get_site_settings()
-    
     if request.method == 'POST':
         address = request.form.get('address', '')
         email = request.form.get('email', '')
@@ -643,8 +1433,59 @@ def admin_contact_info():
         flash('Contact information updated successfully!', 'success')
         return redirect(url_for('admin_contact_info'))
     
-    contact_info = get_contact_info()
-    return render_template('admin/contact_info.html', contact_info=contact_info, site_settings=site_settings)
+    context = get_route_context(include_contact=True)
+    return render_template('admin/contact_info.html', **context)
+
+@app.route('/admin/cache/stats')
+@admin_required
+def admin_cache_stats():
+    """Content and response cache hit/miss counters."""
+    listener = get_invalidation_listener()
+    return jsonify({
+        'content': get_content_cache().stats(),
+        'responses': get_response_cache().stats(),
+        'listener': listener.stats() if listener else None
+    })
+
+@app.route('/admin/outbox')
+@admin_required
+def admin_outbox():
+    """Email outbox status: counts per status, recent dead letters and worker counters."""
+    counts = dict(db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+    dead = EmailOutbox.query.filter_by(status='dead').order_by(EmailOutbox.updated_at.desc()).limit(20).all()
+    worker = get_outbox_worker()
+    try:
+        email_api = get_email_service().stats()
+    except ValueError:
+        email_api = None  # RESEND_API_KEY not set
+    return jsonify({
+        'counts': counts,
+        'dead_letters': [email.to_dict() for email in dead],
+        'worker': worker.stats() if worker else None,
+        'email_api': email_api
+    })
+
+@app.route('/admin/outbox/retry/<int:email_id>', methods=['POST'])
+@admin_required
+def admin_outbox_retry(email_id):
+    """Requeue a dead-lettered email."""
+    email = EmailOutbox.query.get_or_404(email_id)
+    
+    # Only dead letters: requeueing a sent, digested or in-flight email would send it twice.
+    # The status check is part of the UPDATE so a concurrent claim can't slip in between.
+    requeued = EmailOutbox.query.filter_by(id=email_id, status='dead').update({
+        'status': 'pending',
+        'attempts': 0,
+        'batch_key': None,  # Sent on its own from now on
+        'next_attempt_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    if not requeued:
+        return jsonify({'success': False, 'error': f"Only dead emails can be retried (this one is '{email.status}')"}), 409
+    
+    db.session.refresh(email)
+    wake_outbox()
+    return jsonify({'success': True, 'email': email.to_dict()})
 
 # Health check endpoint for Render
 @app.route('/health')
@@ -0,0 +1,489 @@
+"""In-process cache for page content, site settings and contact info."""
+import os
+import copy
+import json
+import socket
+import hashlib
+import time
+import threading
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# One cheap round trip returning an update stamp per cache key. The row
+# counts catch settings that were deleted without touching updated_at.
+# Submission status counts are stamped with max(id) (a primary key lookup,
+# not a count) so new submissions show up; deletes publish an invalidation.
+CONTENT_VERSION_SQL = text("""
+    SELECT 'page:' || page_name AS key, updated_at, 1 AS row_count FROM page_data
+    UNION ALL
+    SELECT 'site_settings', max(updated_at), count(*) FROM site_settings
+    UNION ALL
+    SELECT 'contact_info', max(updated_at), count(*) FROM contact_info
+    UNION ALL
+    SELECT 'status_counts:contact_messages', NULL, max(id) FROM contact_messages
+    UNION ALL
+    SELECT 'status_counts:investor_bookings', NULL, max(id) FROM investor_bookings
+""")
+
+# Postgres NOTIFY channel used to tell other workers which keys changed
+INVALIDATION_CHANNEL = 'content_cache_invalidation'
+
+class ContentCache:
+    """
+    Per-process cache in front of PageData, SiteSettings, ContactInfo and the
+    admin lists' submission counts.
+
+    Entries are served from memory for up to `ttl` seconds. Once the TTL has
+    elapsed, a single version query (updated_at per cache key) decides which
+    cached entries are stale, so edits made in another gunicorn worker show up
+    within `ttl` seconds without reloading unchanged content. When the
+    invalidation listener is running, edits are evicted as soon as they commit
+    and the TTL only acts as a safety net.
+    """
+
+    def __init__(self, ttl=None, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds between version checks (defaults to CONTENT_CACHE_TTL or 30)
+            enabled: Whether caching is enabled (defaults to CONTENT_CACHE_ENABLED or True)
+        """
+        if ttl is None:
+            ttl = float(os.getenv('CONTENT_CACHE_TTL', '30'))
+        if enabled is None:
+            enabled = os.getenv('CONTENT_CACHE_ENABLED', 'true').lower() == 'true'
+
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+        self.invalidations = 0
+
+    def _load_version(self):
+        """Fetch the current update stamp of every cache key from the database."""
+        from models import db
+        rows = db.session.execute(CONTENT_VERSION_SQL).all()
+        return {key: (updated_at, row_count) for key, updated_at, row_count in rows}
+
+    def current_version(self):
+        """
+        Get the per-key version stamps, re-checking the database once the TTL has elapsed.
+
+        Entries whose stamp changed since the last check are evicted.
+
+        Returns:
+            dict mapping cache keys to (updated_at, row_count)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.ttl:
+                return self._version
+
+        # Query outside the lock so a slow database doesn't serialize every request
+        version = self._load_version()
+
+        with self._lock:
+            self.version_checks += 1
+            if self._version is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key in set(self._version) | set(version)
+                         if self._version.get(key) != version.get(key)]
+            if stale:
+                if self._version is not None:
+                    logger.info(f"Content changed, evicting {', '.join(sorted(stale))}")
+                for key in stale:
+                    self._entries.pop(key, None)
+                self._generation += 1
+            self._version = version
+            self._checked_at = now
+            return self._version
+
+    def version_of(self, *keys):
+        """
+        Get the version stamps of specific keys.
+
+        Args:
+            *keys: Cache keys
+
+        Returns:
+            Tuple of stamps, one per key (None for keys with no rows)
+        """
+        version = self.current_version()
+        return tuple(version.get(key) for key in keys)
+
+    def last_modified(self, *keys):
+        """
+        Get the most recent update time of specific keys.
+
+        Args:
+            *keys: Cache keys
+
+        Returns:
+            Naive UTC datetime or None if none of the keys have been saved yet
+        """
+        stamps = [stamp[0] for stamp in self.version_of(*keys) if stamp and stamp[0]]
+        return max(stamps) if stamps else None
+
+    def get(self, key, loader):
+        """
+        Get a cached value, loading it on a miss.
+
+        Args:
+            key: Cache key (e.g. 'page:index', 'site_settings')
+            loader: Callable returning the value when it is not cached
+
+        Returns:
+            A copy of the cached value, safe for the caller to mutate
+        """
+        if not self.enabled:
+            return loader()
+
+        self.current_version()
+
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return copy.deepcopy(self._entries[key])
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            # Don't store values loaded before an invalidation raced with us
+            if generation == self._generation:
+                self._entries[key] = value
+
+        return copy.deepcopy(value)
+
+    def get_many(self, keys, loader):
+        """
+        Get several cached values, loading all misses with a single loader call.
+
+        Args:
+            keys: Cache keys
+            loader: Callable taking the list of missing keys and returning a dict of their values
+
+        Returns:
+            dict mapping each key to a copy of its value
+        """
+        if not self.enabled:
+            return loader(list(keys))
+
+        self.current_version()
+
+        values = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self.hits += 1
+                    values[key] = copy.deepcopy(self._entries[key])
+                else:
+                    self.misses += 1
+                    missing.append(key)
+            generation = self._generation
+
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                # Don't store values loaded before an invalidation raced with us
+                if generation == self._generation:
+                    for key in missing:
+                        self._entries[key] = loaded[key]
+            for key in missing:
+                values[key] = copy.deepcopy(loaded[key])
+
+        return values
+
+    def invalidate(self, *keys):
+        """
+        Evict cached entries.
+
+        Args:
+            *keys: Keys to evict (evicts everything if none are given)
+        """
+        with self._lock:
+            if keys:
+                for key in keys:
+                    self._entries.pop(key, None)
+            else:
+                self._entries.clear()
+                self._version = None
+            self._generation += 1
+            # Force a version re-check on the next read
+            self._checked_at = 0.0
+            self.invalidations += 1
+
+    def stats(self):
+        """Get cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'version_checks': self.version_checks,
+                'invalidations': self.invalidations
+            }
+
+class ResponseCache:
+    """
+    Per-process cache of rendered public pages.
+
+    Each entry holds the encoded HTML for one page together with the content
+    version it was rendered from, a strong ETag and a Last-Modified date. An
+    entry is only served while the content version is unchanged.
+    """
+
+    def __init__(self, enabled=None):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled: Whether caching is enabled (defaults to RESPONSE_CACHE_ENABLED or True)
+        """
+        if enabled is None:
+            enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, version):
+        """
+        Get a rendered page if it was rendered from the given content version.
+
+        Args:
+            key: Page name
+            version: Current content version stamp
+
+        Returns:
+            dict with 'body', 'etag' and 'last_modified', or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def set(self, key, version, body, last_modified=None):
+        """
+        Store a rendered page.
+
+        Args:
+            key: Page name
+            version: Content version stamp the page was rendered from
+            body: Rendered HTML (str or bytes)
+            last_modified: Datetime of the content the page was rendered from
+
+        Returns:
+            The stored entry
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        entry = {
+            'version': version,
+            'body': body,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': last_modified
+        }
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def record_not_modified(self):
+        """Count a conditional GET answered with 304."""
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        """Drop all rendered pages."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get cache counters."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified
+            }
+
+def _origin_token():
+    """Identify this worker process in invalidation messages."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def publish_invalidation(*keys):
+    """
+    Tell every worker to evict `keys` once the current transaction commits.
+
+    Issues pg_notify on the session's connection, so nothing is sent if the
+    transaction rolls back. Does nothing on databases other than Postgres.
+
+    Args:
+        *keys: Cache keys that changed
+    """
+    from models import db
+    if db.engine.dialect.name != 'postgresql':
+        return
+    payload = json.dumps({'keys': list(keys), 'origin': _origin_token()})
+    db.session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {'channel': INVALIDATION_CHANNEL, 'payload': payload}
+    )
+
+class InvalidationListener(threading.Thread):
+    """
+    Background thread that LISTENs for content changes made by other workers.
+
+    LISTEN needs a session-level connection, so this connects directly rather
+    than through a transaction-mode pooler such as Neon's -pooler endpoint.
+    """
+
+    def __init__(self, database_url, channel=INVALIDATION_CHANNEL, reconnect_delay=5, poll_interval=60):
+        """
+        Initialize the listener.
+
+        Args:
+            database_url: Direct (non-pooled) Postgres connection URL
+            channel: NOTIFY channel to listen on
+            reconnect_delay: Seconds to wait before reconnecting after an error
+            poll_interval: Seconds between keep-alive queries while idle
+        """
+        super().__init__(name='content-cache-listener', daemon=True)
+        self.database_url = database_url
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.poll_interval = poll_interval
+        self.connected = False
+        self.notifications = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Ask the listener to exit after its current wait."""
+        self._stop_event.set()
+
+    def handle(self, payload):
+        """
+        Evict the keys named in a notification payload.
+
+        Args:
+            payload: JSON payload published by publish_invalidation
+        """
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed cache invalidation: {payload!r}")
+            return
+
+        self.notifications += 1
+        if message.get('origin') == _origin_token():
+            return  # Already evicted locally when the change was saved
+
+        keys = message.get('keys') or []
+        get_content_cache().invalidate(*keys)
+        logger.info(f"Evicted {', '.join(keys) or 'all keys'} after change in another worker")
+
+    def run(self):
+        """Listen until stopped, reconnecting on errors."""
+        import psycopg
+
+        while not self._stop_event.is_set():
+            try:
+                with psycopg.connect(self.database_url, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.channel}")
+                    self.connected = True
+                    # Anything could have changed while we weren't listening
+                    get_content_cache().invalidate()
+
+                    while not self._stop_event.is_set():
+                        for notify in conn.notifies(timeout=self.poll_interval):
+                            self.handle(notify.payload)
+                        conn.execute("SELECT 1")  # Keep-alive, surfaces dropped connections
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            self.connected = False
+            self._stop_event.wait(self.reconnect_delay)
+
+    def stats(self):
+        """Get listener status."""
+        return {
+            'connected': self.connected,
+            'notifications': self.notifications
+        }
+
+# Global instances
+_content_cache = None
+_response_cache = None
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+def get_content_cache():
+    """Get or create content cache instance."""
+    global _content_cache
+    if _content_cache is None:
+        _content_cache = ContentCache()
+    return _content_cache
+
+def get_response_cache():
+    """Get or create response cache instance."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+def start_invalidation_listener(database_url):
+    """
+    Start the invalidation listener for this worker process if it isn't running.
+
+    Safe to call on every request: gunicorn forks workers after import, so the
+    listener is started lazily and once per process.
+
+    Args:
+        database_url: Direct (non-pooled) Postgres connection URL
+
+    Returns:
+        The running InvalidationListener
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid() and _listener.is_alive():
+        return _listener
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid() or not _listener.is_alive():
+            _listener = InvalidationListener(database_url)
+            _listener_pid = os.getpid()
+            _listener.start()
+    return _listener
+
+def get_invalidation_listener():
+    """Get this worker's invalidation listener, if one was started."""
+    if _listener_pid != os.getpid():
+        return None
+    return _listener
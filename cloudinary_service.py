@@ -1,13 +1,258 @@
 """Cloudinary service for file uploads and management."""
 import os
+import re
+import time
+import uuid
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from markupsafe import Markup
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
-from cloudinary.utils import cloudinary_url
+from cloudinary.utils import cloudinary_url, api_sign_request, verify_api_response_signature, build_eager
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Videos and files above this size are uploaded in chunks (Cloudinary caps single-request uploads at 100MB)
+LARGE_UPLOAD_THRESHOLD = int(os.getenv('CLOUDINARY_LARGE_UPLOAD_THRESHOLD', str(20 * 1024 * 1024)))
+# Bytes per chunk; Cloudinary requires at least 5MB for every chunk but the last
+UPLOAD_CHUNK_SIZE = max(int(os.getenv('CLOUDINARY_CHUNK_SIZE', str(20 * 1024 * 1024))), 5 * 1024 * 1024)
+# Concurrent Cloudinary uploads per worker process for upload_files, shared by all requests
+UPLOAD_CONCURRENCY = int(os.getenv('CLOUDINARY_UPLOAD_CONCURRENCY', '4'))
+# Width ladder (px) for responsive image derivatives; each is generated eagerly at upload time
+RESPONSIVE_WIDTHS = tuple(int(w) for w in os.getenv('CLOUDINARY_RESPONSIVE_WIDTHS', '320,640,960,1280,1920').split(','))
+# Video derivatives generated at upload time: a poster frame and an HLS adaptive-streaming ladder
+VIDEO_POSTER_TRANSFORMATION = {'start_offset': os.getenv('CLOUDINARY_POSTER_OFFSET', '0')}
+VIDEO_STREAMING_PROFILE = os.getenv('CLOUDINARY_STREAMING_PROFILE', 'auto')
+
+# https://res.cloudinary.com/<cloud>/<image|video>/upload/[<transformations>/]v<version>/<public_id>.<format>
+CLOUDINARY_UPLOAD_URL = re.compile(
+    r'^https?://res\.cloudinary\.com/(?P<cloud_name>[^/]+)/(?P<resource_type>image|video)/upload/(?P<path>[^?#]+)$'
+)
+
+def _stream_size(stream):
+    """Get the total size of a seekable stream without moving its position, or None."""
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def file_sha256(file, chunk_size=1024 * 1024):
+    """
+    Get the SHA-256 hex digest of a file, reading it in chunks.
+    
+    Args:
+        file: Seekable file path, file object or werkzeug FileStorage (hashed from the start, then left at its original position)
+        chunk_size: Bytes read at a time
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return file_sha256(f, chunk_size)
+    
+    stream = getattr(file, 'stream', file)
+    position = stream.tell()
+    stream.seek(0)
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        sha256.update(chunk)
+    stream.seek(position)
+    return sha256.hexdigest()
+
+def responsive_transformation(width):
+    """Get the transformation for one responsive derivative: scaled down to `width`, best format and quality per browser."""
+    return {'width': width, 'crop': 'limit', 'fetch_format': 'auto', 'quality': 'auto'}
+
+def responsive_eager(widths=RESPONSIVE_WIDTHS):
+    """Get the eager transformations that pre-generate every responsive derivative at upload time."""
+    return [responsive_transformation(width) for width in widths]
+
+def video_eager():
+    """Get the eager transformations that generate a video's poster frame and HLS renditions at upload time."""
+    return [
+        {**VIDEO_POSTER_TRANSFORMATION, 'format': 'jpg'},
+        {'streaming_profile': VIDEO_STREAMING_PROFILE, 'format': 'm3u8'}
+    ]
+
+def eager_transformations(resource_type):
+    """Get the eager transformations requested for an upload of this resource type, or None."""
+    if resource_type == 'image':
+        return responsive_eager()
+    if resource_type == 'video':
+        return video_eager()
+    return None
+
+def file_url(public_id, resource_type='image', transformation=None, **options):
+    """
+    Build a Cloudinary delivery URL.
+    
+    Args:
+        public_id: Cloudinary public ID
+        resource_type: 'image', 'video', or 'raw'
+        transformation: Dict of transformation options
+        **options: Other cloudinary_url options (version, format, cloud_name, secure)
+    
+    Returns:
+        URL string
+    """
+    url, url_options = cloudinary_url(
+        public_id,
+        resource_type=resource_type,
+        transformation=transformation,
+        **options
+    )
+    return url
+
+def parse_upload_url(url, resource_type='image'):
+    """
+    Split an untransformed Cloudinary delivery URL into the parts needed to rebuild it.
+    
+    Args:
+        url: Delivery URL
+        resource_type: 'image' or 'video'
+    
+    Returns:
+        dict with 'cloud_name', 'public_id', 'version' and 'format', or None for URLs
+        hosted elsewhere, other resource types and URLs that are already transformed
+    """
+    match = CLOUDINARY_UPLOAD_URL.match(url or '')
+    if not match or match.group('resource_type') != resource_type:
+        return None
+    
+    segments = match.group('path').split('/')
+    version = None
+    if re.fullmatch(r'v\d+', segments[0]):
+        version = segments.pop(0)[1:]
+    elif any(re.fullmatch(r'v\d+', segment) for segment in segments):
+        return None  # Transformations come before the version
+    
+    public_id, ext = os.path.splitext('/'.join(segments))
+    return {
+        'cloud_name': match.group('cloud_name'),
+        'public_id': public_id,
+        'version': version,
+        'format': ext[1:] or None
+    }
+
+def parse_image_url(url):
+    """Parse a Cloudinary image URL that can be resized (see parse_upload_url)."""
+    parsed = parse_upload_url(url, 'image')
+    if parsed and (parsed['format'] or '').lower() in ('svg', 'gif'):
+        return None  # Vector art and animations are served as uploaded
+    return parsed
+
+def video_derivative_urls(url):
+    """
+    Get the poster frame and HLS streaming URLs of a Cloudinary video.
+    
+    Args:
+        url: Delivery URL of the uploaded video
+    
+    Returns:
+        dict with 'poster_url' and 'streaming_url', or None if the URL isn't a Cloudinary video
+    """
+    parsed = parse_upload_url(url, 'video')
+    if parsed is None:
+        return None
+    
+    options = {'version': parsed['version'], 'cloud_name': parsed['cloud_name'], 'secure': True}
+    return {
+        'poster_url': file_url(parsed['public_id'], resource_type='video', format='jpg',
+                               transformation=VIDEO_POSTER_TRANSFORMATION, **options),
+        'streaming_url': file_url(parsed['public_id'], resource_type='video', format='m3u8',
+                                  transformation={'streaming_profile': VIDEO_STREAMING_PROFILE}, **options)
+    }
+
+@lru_cache(maxsize=1024)
+def responsive_image_attrs(url, sizes='100vw', widths=RESPONSIVE_WIDTHS):
+    """
+    Get src, srcset and sizes attributes for an <img>, so browsers download the smallest derivative that fits.
+    
+    Args:
+        url: Image URL as stored in the database
+        sizes: Value of the sizes attribute (the rendered width of the image)
+        widths: Widths (px) offered in the srcset
+    
+    Returns:
+        Markup of the attributes; URLs that aren't Cloudinary images just get src
+    """
+    parsed = parse_image_url(url)
+    if parsed is None:
+        return Markup('src="{}"').format(url or '')
+    
+    candidates = [
+        (width, file_url(
+            parsed['public_id'],
+            transformation=responsive_transformation(width),
+            version=parsed['version'],
+            format=parsed['format'],
+            cloud_name=parsed['cloud_name'],
+            secure=True
+        ))
+        for width in widths
+    ]
+    # Fallback src for browsers without srcset: the middle of the ladder
+    src = candidates[len(candidates) // 2][1]
+    srcset = ', '.join(f"{candidate} {width}w" for width, candidate in candidates)
+    return Markup('src="{}" srcset="{}" sizes="{}"').format(src, srcset, sizes)
+
+def get_file_type(filename):
+    """Determine file type ('image', 'video', 'pdf' or 'other') from filename."""
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    image_exts = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'bmp', 'ico'}
+    video_exts = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv', 'wmv'}
+    pdf_exts = {'pdf'}
+    
+    if ext in image_exts:
+        return 'image'
+    elif ext in video_exts:
+        return 'video'
+    elif ext in pdf_exts:
+        return 'pdf'
+    else:
+        return 'other'
+
+def get_resource_type(filename):
+    """Get the Cloudinary resource type ('image', 'video' or 'raw') for a filename."""
+    file_type = get_file_type(filename)
+    if file_type in ('image', 'video'):
+        return file_type
+    return 'raw'
+
+def new_public_id(filename, resource_type, suffix=None):
+    """
+    Get a unique, readable public ID (without folder) for an upload.
+    
+    Args:
+        filename: Original filename
+        resource_type: 'image', 'video' or 'raw'
+        suffix: Unique suffix (defaults to a random one)
+    """
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    stem = re.sub(r'[^A-Za-z0-9_-]+', '_', stem).strip('_')[:60] or 'file'
+    public_id = f"{stem}_{suffix or uuid.uuid4().hex[:8]}"
+    if resource_type == 'raw':
+        public_id += ext.lower()  # Raw assets keep their extension in the public ID
+    return public_id
+
+def _read_chunk(stream, size):
+    """Read up to `size` bytes, looping over short reads from network streams."""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
 class CloudinaryService:
     """Service for handling Cloudinary file operations."""
     
@@ -44,19 +289,89 @@ class CloudinaryService:
     
     def get_file_type(self, filename):
         """Determine file type from filename."""
-        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        image_exts = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'bmp', 'ico'}
-        video_exts = {'mp4', 'webm', 'ogg', 'mov', 'avi', 'mkv', 'flv', 'wmv'}
-        pdf_exts = {'pdf'}
-        
-        if ext in image_exts:
-            return 'image'
-        elif ext in video_exts:
-            return 'video'
-        elif ext in pdf_exts:
-            return 'pdf'
-        else:
-            return 'other'
+        return get_file_type(filename)
+    
+    def get_resource_type(self, filename):
+        """Get the Cloudinary resource type ('image', 'video' or 'raw') for a filename."""
+        return get_resource_type(filename)
+    
+    def new_public_id(self, filename, resource_type, suffix=None):
+        """Get a unique, readable public ID (without folder) for an upload (see new_public_id)."""
+        return new_public_id(filename, resource_type, suffix=suffix)
+    
+    def use_chunked_upload(self, resource_type, file_size):
+        """Check whether an upload should go through the chunked path."""
+        return resource_type == 'video' or (file_size or 0) > LARGE_UPLOAD_THRESHOLD
+    
+    def sign_upload(self, filename, folder='uploads/files', file_size=None):
+        """
+        Create signed parameters for uploading a file straight from the browser to Cloudinary.
+        
+        The signature pins the upload to a public ID chosen here, and Cloudinary
+        rejects it once the timestamp is more than an hour old.
+        
+        Args:
+            filename: Original filename (used for the resource type and a readable public ID)
+            folder: Cloudinary folder to upload to
+            file_size: Size in bytes, if known
+        
+        Returns:
+            dict with 'upload_url', 'resource_type', 'params' (form fields to send with the file)
+            and 'chunk_size' (send the file in chunks of this size, or None for one request)
+        """
+        config = cloudinary.config()
+        resource_type = self.get_resource_type(filename)
+        public_id = self.new_public_id(filename, resource_type)
+        
+        params = {
+            'timestamp': int(time.time()),
+            'folder': folder,
+            'public_id': public_id
+        }
+        eager = eager_transformations(resource_type)
+        if eager:
+            # Signed like every other param, so the browser can't change them
+            params['eager'] = build_eager(eager)
+            params['eager_async'] = 'true'
+        params['signature'] = api_sign_request(params, config.api_secret)
+        params['api_key'] = config.api_key
+        
+        return {
+            'upload_url': f"https://api.cloudinary.com/v1_1/{config.cloud_name}/{resource_type}/upload",
+            'resource_type': resource_type,
+            'params': params,
+            'chunk_size': UPLOAD_CHUNK_SIZE if self.use_chunked_upload(resource_type, file_size) else None
+        }
+    
+    def verify_upload(self, public_id, version, signature, resource_type='image', format=None):
+        """
+        Verify the upload response the browser got from Cloudinary.
+        
+        Args:
+            public_id: Public ID from the upload response
+            version: Version from the upload response
+            signature: Signature from the upload response
+            resource_type: 'image', 'video' or 'raw'
+            format: Format from the upload response (not used for raw assets)
+        
+        Returns:
+            Delivery URL of the asset, or None if the signature doesn't match
+        """
+        try:
+            if not verify_api_response_signature(public_id, version, signature):
+                return None
+        except Exception as e:
+            logger.error(f"Error verifying Cloudinary upload signature: {e}")
+            return None
+        
+        url, options = cloudinary_url(
+            public_id,
+            resource_type=resource_type,
+            version=version,
+            format=None if resource_type == 'raw' else format,
+            secure=True
+        )
+        return url
     
     def upload_file(self, file, folder='uploads', resource_type='auto', **options):
         """
@@ -81,13 +396,15 @@ class CloudinaryService:
                 else:
                     filename = 'file'
                 
-                file_type = self.get_file_type(filename)
-                if file_type == 'image':
-                    resource_type = 'image'
-                elif file_type == 'video':
-                    resource_type = 'video'
-                else:
-                    resource_type = 'raw'
+                resource_type = self.get_resource_type(filename)
+            
+            # Large files and videos go through the chunked path
+            if isinstance(file, str):
+                file_size = os.path.getsize(file)
+            else:
+                file_size = getattr(file, 'content_length', None) or _stream_size(getattr(file, 'stream', file))
+            if self.use_chunked_upload(resource_type, file_size):
+                return self.upload_large(file, folder=folder, resource_type=resource_type, file_size=file_size, **options)
             
             # Prepare upload options
             upload_options = {
@@ -97,6 +414,11 @@ class CloudinaryService:
                 'overwrite': False,
                 **options
             }
+            eager = eager_transformations(resource_type)
+            if eager:
+                # Generate derivatives now (image widths, video poster and HLS), so first views don't wait on them
+                upload_options.setdefault('eager', eager)
+                upload_options.setdefault('eager_async', True)
             
             # Upload file
             if hasattr(file, 'read'):
@@ -116,19 +438,7 @@ class CloudinaryService:
             else:
                 raise ValueError("Invalid file type. Must be file object or file path.")
             
-            # Return standardized response
-            return {
-                'success': True,
-                'url': result.get('secure_url') or result.get('url'),
-                'public_id': result.get('public_id'),
-                'format': result.get('format'),
-                'width': result.get('width'),
-                'height': result.get('height'),
-                'bytes': result.get('bytes'),
-                'resource_type': result.get('resource_type'),
-                'created_at': result.get('created_at'),
-                'raw': result  # Include full response
-            }
+            return self._upload_response(result)
         
         except Exception as e:
             logger.error(f"Error uploading file to Cloudinary: {e}")
@@ -137,6 +447,150 @@ class CloudinaryService:
                 'error': str(e)
             }
     
+    def upload_files(self, files, folder='uploads/files', **options):
+        """
+        Upload several files concurrently on the shared upload pool.
+        
+        Args:
+            files: File objects or file paths
+            folder: Cloudinary folder to upload to
+            **options: Additional Cloudinary upload options
+        
+        Returns:
+            List of upload_file results, in the order of `files`
+        """
+        pool = get_upload_pool()
+        futures = [pool.submit(self.upload_file, file, folder=folder, **options) for file in files]
+        return [future.result() for future in futures]
+    
+    def upload_large(self, file, folder='uploads/videos', resource_type='video', file_size=None,
+                     filename=None, chunk_size=None, resume=None, max_retries=3, **options):
+        """
+        Upload a large file to Cloudinary in fixed-size chunks.
+        
+        Only one chunk is held in memory at a time, so `file` can be the raw
+        request body. Each chunk is retried with backoff; if it still fails, the
+        result carries a 'resume' token, and calling again with it (and the same
+        file, or a stream positioned at resume['offset']) continues where the
+        upload stopped instead of starting over.
+        
+        Args:
+            file: File path, file object, FileStorage or non-seekable stream
+            folder: Cloudinary folder to upload to
+            resource_type: 'image', 'video' or 'raw'
+            file_size: Total size in bytes (required for non-seekable streams)
+            filename: Original filename (defaults to the file's name)
+            chunk_size: Bytes per chunk (defaults to CLOUDINARY_CHUNK_SIZE or 20MB)
+            resume: 'resume' token from a failed upload_large result
+            max_retries: Retries per chunk before giving up
+            **options: Additional Cloudinary upload options
+        
+        Returns:
+            dict like upload_file plus 'content_hash' (SHA-256, computed while streaming;
+            None for a resumed upload), or with 'success' False, 'error' and 'resume'
+        """
+        chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        
+        if isinstance(file, str):
+            filename = filename or os.path.basename(file)
+            file_size = file_size or os.path.getsize(file)
+            stream = open(file, 'rb')
+        else:
+            filename = filename or getattr(file, 'filename', None) or getattr(file, 'name', None) or 'stream'
+            stream = getattr(file, 'stream', file)  # Unwrap werkzeug FileStorage
+            file_size = file_size or _stream_size(stream)
+        
+        if not file_size:
+            return {
+                'success': False,
+                'error': 'File size is required for a chunked upload'
+            }
+        
+        # The same upload ID and public ID tie every chunk (and a resumed upload) together
+        resume = dict(resume or {
+            'upload_id': cloudinary.utils.random_public_id(),
+            'public_id': self.new_public_id(filename, resource_type),
+            'offset': 0
+        })
+        upload_options = {
+            'folder': folder,
+            'public_id': resume['public_id'],
+            'overwrite': False,
+            **options
+        }
+
+        eager = eager_transformations(resource_type)
+        if eager:
+            upload_options.setdefault('eager', eager)
+            upload_options.setdefault('eager_async', True)
+        
+        try:
+            if resume['offset'] and _stream_size(stream) is not None:
+                stream.seek(resume['offset'])
+            
+            # Hash while streaming; only possible when this call sees the whole file
+            sha256 = hashlib.sha256() if resume['offset'] == 0 else None
+            
+            result = None
+            while resume['offset'] < file_size:
+                chunk = _read_chunk(stream, min(chunk_size, file_size - resume['offset']))
+                if not chunk:
+                    raise IOError(f"File ended at byte {resume['offset']} of {file_size}")
+                if sha256:
+                    sha256.update(chunk)
+                
+                http_headers = {
+                    'Content-Range': f"bytes {resume['offset']}-{resume['offset'] + len(chunk) - 1}/{file_size}",
+                    'X-Unique-Upload-Id': resume['upload_id']
+                }
+                for attempt in range(max_retries + 1):
+                    try:
+                        result = cloudinary.uploader.upload_large_part(
+                            (filename, chunk),
+                            http_headers=http_headers,
+                            resource_type=resource_type,
+                            **upload_options
+                        )
+                        break
+                    except Exception as e:
+                        if attempt == max_retries:
+                            raise
+                        logger.warning(f"Chunk at byte {resume['offset']} of {filename} failed ({e}), retrying")
+                        time.sleep(2 ** attempt)
+                
+                resume['offset'] += len(chunk)
+            
+            response = self._upload_response(result)
+            response['content_hash'] = sha256.hexdigest() if sha256 else None
+            return response
+        
+        except Exception as e:
+            logger.error(f"Error uploading large file to Cloudinary at byte {resume['offset']} of {file_size}: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'resume': resume
+            }
+        
+        finally:
+            if isinstance(file, str):
+                stream.close()
+    
+    def _upload_response(self, result):
+        """Standardize a Cloudinary upload response."""
+        return {
+            'success': True,
+            'url': result.get('secure_url') or result.get('url'),
+            'public_id': result.get('public_id'),
+            'format': result.get('format'),
+            'width': result.get('width'),
+            'height': result.get('height'),
+            'bytes': result.get('bytes'),
+            'resource_type': result.get('resource_type'),
+            'created_at': result.get('created_at'),
+            'raw': result  # Include full response
+        }
+    
     def delete_file(self, public_id, resource_type='image'):
         """
         Delete a file from Cloudinary.
@@ -172,7 +626,46 @@ class CloudinaryService:
                 'error': str(e)
             }
     
-    def get_file_url(self, public_id, resource_type='image', transformation=None):
+    def delete_files(self, public_ids, resource_type='image', batch_size=100):
+        """
+        Delete many files from Cloudinary, up to batch_size per API call.
+        
+        Args:
+            public_ids: Cloudinary public IDs, all of the same resource type
+            resource_type: 'image', 'video', or 'raw'
+            batch_size: IDs per delete_resources call (Cloudinary allows at most 100)
+        
+        Returns:
+            dict with 'success', 'deleted' (IDs now gone, including ones that were
+            already missing) and 'failed' (ID -> error)
+        """
+        public_ids = list(public_ids)
+        deleted = []
+        failed = {}
+        for start in range(0, len(public_ids), batch_size):
+            batch = public_ids[start:start + batch_size]
+            try:
+                result = cloudinary.api.delete_resources(batch, resource_type=resource_type, type='upload')
+            except Exception as e:
+                logger.error(f"Error deleting files from Cloudinary: {e}")
+                failed.update({public_id: str(e) for public_id in batch})
+                continue
+            
+            statuses = result.get('deleted', {})
+            for public_id in batch:
+                status = statuses.get(public_id)
+                if status in ('deleted', 'not_found'):
+                    deleted.append(public_id)
+                else:
+                    failed[public_id] = status or 'Unknown error'
+        
+        return {
+            'success': not failed,
+            'deleted': deleted,
+            'failed': failed
+        }
+    
+    def get_file_url(self, public_id, resource_type='image', transformation=None, **options):
         """
         Get Cloudinary URL for a file with optional transformations.
         
@@ -180,17 +673,13 @@ class CloudinaryService:
             public_id: Cloudinary public ID
             resource_type: 'image', 'video', or 'raw'
             transformation: Dict of transformation options
+            **options: Other URL options (version, format, secure)
         
         Returns:
             URL string
         """
         try:
-            url, options = cloudinary_url(
-                public_id,
-                resource_type=resource_type,
-                transformation=transformation
-            )
-            return url
+            return file_url(public_id, resource_type=resource_type, transformation=transformation, **options)
         except Exception as e:
             logger.error(f"Error generating Cloudinary URL: {e}")
             return None
@@ -213,6 +702,18 @@ class CloudinaryService:
 
 # Global instance
 _cloudinary_service = None
+_upload_pool = None
+_upload_pool_pid = None
+_upload_pool_lock = threading.Lock()
+
+def get_upload_pool():
+    """Get this process's upload thread pool (recreated after a fork, since threads don't survive one)."""
+    global _upload_pool, _upload_pool_pid
+    with _upload_pool_lock:
+        if _upload_pool is None or _upload_pool_pid != os.getpid():
+            _upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix='cloudinary-upload')
+            _upload_pool_pid = os.getpid()
+        return _upload_pool
 
 def get_cloudinary_service():
     """Get or create Cloudinary service instance."""
@@ -0,0 +1,101 @@
+"""Country list for the investor booking form, encoded once at import time."""
+import json
+import hashlib
+import unicodedata
+
+# Country name -> ISO 3166-1 alpha-2 code (Kosovo uses the user-assigned XK)
+COUNTRY_CODES = {
+    'United States': 'US', 'United Kingdom': 'GB', 'Canada': 'CA', 'Australia': 'AU', 'Germany': 'DE',
+    'France': 'FR', 'Italy': 'IT', 'Spain': 'ES', 'Netherlands': 'NL', 'Belgium': 'BE', 'Switzerland': 'CH',
+    'Austria': 'AT', 'Sweden': 'SE', 'Norway': 'NO', 'Denmark': 'DK', 'Finland': 'FI', 'Poland': 'PL',
+    'Portugal': 'PT', 'Greece': 'GR', 'Ireland': 'IE', 'Czech Republic': 'CZ', 'Hungary': 'HU',
+    'Romania': 'RO', 'Bulgaria': 'BG', 'Croatia': 'HR', 'Slovakia': 'SK', 'Slovenia': 'SI', 'Estonia': 'EE',
+    'Latvia': 'LV', 'Lithuania': 'LT', 'Luxembourg': 'LU', 'Malta': 'MT', 'Cyprus': 'CY', 'Japan': 'JP',
+    'China': 'CN', 'India': 'IN', 'South Korea': 'KR', 'Singapore': 'SG', 'Hong Kong': 'HK', 'Taiwan': 'TW',
+    'Thailand': 'TH', 'Malaysia': 'MY', 'Indonesia': 'ID', 'Philippines': 'PH', 'Vietnam': 'VN',
+    'New Zealand': 'NZ', 'South Africa': 'ZA', 'Brazil': 'BR', 'Mexico': 'MX', 'Argentina': 'AR',
+    'Chile': 'CL', 'Colombia': 'CO', 'Peru': 'PE', 'Venezuela': 'VE', 'Uruguay': 'UY', 'Ecuador': 'EC',
+    'Panama': 'PA', 'Costa Rica': 'CR', 'Guatemala': 'GT', 'Honduras': 'HN', 'El Salvador': 'SV',
+    'Nicaragua': 'NI', 'Dominican Republic': 'DO', 'Jamaica': 'JM', 'Trinidad and Tobago': 'TT',
+    'Bahamas': 'BS', 'Barbados': 'BB', 'Belize': 'BZ', 'Israel': 'IL', 'United Arab Emirates': 'AE',
+    'Saudi Arabia': 'SA', 'Qatar': 'QA', 'Kuwait': 'KW', 'Bahrain': 'BH', 'Oman': 'OM', 'Jordan': 'JO',
+    'Lebanon': 'LB', 'Egypt': 'EG', 'Turkey': 'TR', 'Russia': 'RU', 'Ukraine': 'UA', 'Kazakhstan': 'KZ',
+    'Belarus': 'BY', 'Georgia': 'GE', 'Armenia': 'AM', 'Azerbaijan': 'AZ', 'Moldova': 'MD', 'Albania': 'AL',
+    'Bosnia and Herzegovina': 'BA', 'Serbia': 'RS', 'Montenegro': 'ME', 'North Macedonia': 'MK',
+    'Kosovo': 'XK', 'Iceland': 'IS', 'Liechtenstein': 'LI', 'Monaco': 'MC', 'San Marino': 'SM',
+    'Andorra': 'AD', 'Vatican City': 'VA', 'Bangladesh': 'BD', 'Pakistan': 'PK', 'Sri Lanka': 'LK',
+    'Nepal': 'NP', 'Bhutan': 'BT', 'Myanmar': 'MM', 'Cambodia': 'KH', 'Laos': 'LA', 'Mongolia': 'MN',
+    'North Korea': 'KP', 'Afghanistan': 'AF', 'Iran': 'IR', 'Iraq': 'IQ', 'Syria': 'SY', 'Yemen': 'YE',
+    'Libya': 'LY', 'Tunisia': 'TN', 'Algeria': 'DZ', 'Morocco': 'MA', 'Sudan': 'SD', 'Ethiopia': 'ET',
+    'Kenya': 'KE', 'Tanzania': 'TZ', 'Uganda': 'UG', 'Ghana': 'GH', 'Nigeria': 'NG', 'Senegal': 'SN',
+    'Ivory Coast': 'CI', 'Cameroon': 'CM', 'Gabon': 'GA', 'Angola': 'AO', 'Mozambique': 'MZ',
+    'Madagascar': 'MG', 'Mauritius': 'MU', 'Seychelles': 'SC', 'Botswana': 'BW', 'Namibia': 'NA',
+    'Zimbabwe': 'ZW', 'Zambia': 'ZM', 'Malawi': 'MW', 'Rwanda': 'RW', 'Burundi': 'BI', 'Djibouti': 'DJ',
+    'Eritrea': 'ER', 'Somalia': 'SO', 'Chad': 'TD', 'Niger': 'NE', 'Mali': 'ML', 'Burkina Faso': 'BF',
+    'Guinea': 'GN', 'Sierra Leone': 'SL', 'Liberia': 'LR', 'Togo': 'TG', 'Benin': 'BJ', 'Gambia': 'GM',
+    'Guinea-Bissau': 'GW', 'Cape Verde': 'CV', 'São Tomé and Príncipe': 'ST', 'Equatorial Guinea': 'GQ',
+    'Central African Republic': 'CF', 'Republic of the Congo': 'CG',
+    'Democratic Republic of the Congo': 'CD', 'Other': None
+}
+
+def normalize(text):
+    """Lowercase and strip accents so 'sao' matches 'São'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+def encode(value):
+    """Encode a JSON response body and its ETag."""
+    body = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+def build_prefix_index(names):
+    """
+    Map every prefix of every name (and of each word in it) to its encoded matches.
+
+    Matches on the start of the full name come first, then matches on a later
+    word (so 'korea' finds North and South Korea), each in alphabetical order.
+    """
+    full_matches = {}
+    word_matches = {}
+    for name in names:
+        normalized = normalize(name)
+        for end in range(1, len(normalized) + 1):
+            full_matches.setdefault(normalized[:end], []).append(name)
+        for word in normalized.replace('-', ' ').split()[1:]:
+            for end in range(1, len(word) + 1):
+                word_matches.setdefault(word[:end], []).append(name)
+
+    index = {'': encode([{'name': name, 'code': COUNTRY_CODES[name]} for name in names])}
+    for prefix in set(full_matches) | set(word_matches):
+        matches = list(full_matches.get(prefix, []))
+        matches += [name for name in word_matches.get(prefix, []) if name not in matches]
+        index[prefix] = encode([{'name': name, 'code': COUNTRY_CODES[name]} for name in matches])
+    return index
+
+# Built once at import
+COUNTRY_NAMES = tuple(sorted(COUNTRY_CODES))
+COUNTRIES_JSON, COUNTRIES_ETAG = encode(list(COUNTRY_NAMES))
+PREFIX_INDEX = build_prefix_index(COUNTRY_NAMES)
+NO_MATCHES_JSON, NO_MATCHES_ETAG = encode([])
+CANONICAL_NAMES = {normalize(name): name for name in COUNTRY_NAMES}
+
+def search_countries(query):
+    """
+    Look up countries whose name (or a word in it) starts with `query`.
+
+    Args:
+        query: Typeahead input
+
+    Returns:
+        Tuple of (encoded JSON list of {'name', 'code'}, ETag)
+    """
+    return PREFIX_INDEX.get(normalize(query or ''), (NO_MATCHES_JSON, NO_MATCHES_ETAG))
+
+def canonical_country(name):
+    """
+    Get the listed spelling of a country name, matching case and accents loosely.
+
+    Returns:
+        Name from COUNTRY_NAMES, or None if it isn't a listed country
+    """
+    return CANONICAL_NAMES.get(normalize(name or ''))
@@ -39,6 +39,31 @@ def configure_database_url_for_pooling(database_url):
     
     return urlunparse(new_parsed)
 
+def get_direct_database_url(database_url=None):
+    """
+    Get a URL for a direct (non-pooled) connection to the database.
+    
+    Session features such as LISTEN don't work through Neon's transaction-mode
+    pooler, so the "-pooler" suffix is dropped from the endpoint hostname.
+    DATABASE_DIRECT_URL takes precedence when set.
+    """
+    direct_url = os.getenv('DATABASE_DIRECT_URL')
+    if direct_url:
+        return direct_url
+    
+    if database_url is None:
+        database_url = get_database_url()
+    
+    # psycopg expects a plain libpq URL
+    database_url = database_url.replace('postgresql+psycopg://', 'postgresql://', 1)
+    
+    parsed = urlparse(database_url)
+    if parsed.hostname and '-pooler' in parsed.hostname:
+        netloc = parsed.netloc.replace(parsed.hostname, parsed.hostname.replace('-pooler', '', 1), 1)
+        parsed = parsed._replace(netloc=netloc)
+    
+    return urlunparse(parsed)
+
 def create_db_engine(database_url=None, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=3600):
     """
     Create SQLAlchemy engine with connection pooling and reconnection logic.
@@ -142,6 +167,19 @@ def init_db(app, database_url=None):
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
             raise
+        
+        # Changes to existing tables (see migrations.py) are applied by migrate.py in
+        # the build step. AUTO_MIGRATE=true also applies them here, at every worker's
+        # startup, so only wait briefly for a migration another process is running
+        if db.engine.dialect.name == 'postgresql' and os.getenv('AUTO_MIGRATE', 'false').lower() == 'true':
+            from migrations import run_migrations
+            try:
+                run_migrations(database_url, lock_wait=int(os.getenv('AUTO_MIGRATE_LOCK_WAIT', '10')))
+            except TimeoutError:
+                logger.warning("Another process is still applying schema migrations; starting without waiting for it")
+            except Exception as e:
+                logger.error(f"Error applying schema migrations: {e}")
+                raise
 
 def get_db_session(app):
     """Get a database session from the Flask app context."""
@@ -0,0 +1,506 @@
+"""Bulk email campaigns to segments of investors or contacts, sent in the background."""
+import os
+import time
+import queue
+import threading
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Segment key -> (label, source, status filter or None for everyone)
+SEGMENTS = {
+    'investors:pending': ('Investors - pending meeting requests', 'investors', 'pending'),
+    'investors:confirmed': ('Investors - confirmed meetings', 'investors', 'confirmed'),
+    'investors:cancelled': ('Investors - cancelled meetings', 'investors', 'cancelled'),
+    'investors:all': ('Investors - everyone', 'investors', None),
+    'contacts:new': ('Contacts - new messages', 'contacts', 'new'),
+    'contacts:replied': ('Contacts - replied', 'contacts', 'replied'),
+    'contacts:all': ('Contacts - everyone', 'contacts', None)
+}
+
+def segment_choices():
+    """Get (key, label) choices for the campaign form."""
+    return [(key, label) for key, (label, source, status) in SEGMENTS.items()]
+
+def segment_query(segment, campaign_id=None):
+    """
+    Build the recipient query for a segment: one row (id, email) per distinct address.
+
+    Args:
+        segment: Key in SEGMENTS
+        campaign_id: Leave out addresses this campaign already has a result for
+
+    Returns:
+        SQLAlchemy select of (id, email) ordered by email
+    """
+    from sqlalchemy import select, func, exists
+    from models import ContactMessage, InvestorBooking, CampaignRecipient
+
+    label, source, status = SEGMENTS[segment]
+    model = InvestorBooking if source == 'investors' else ContactMessage
+    email = func.lower(func.trim(model.email))
+
+    query = (select(model.id, email.label('email'))
+             .distinct(email)
+             .where(model.email != '')
+             .order_by(email, model.id))
+    if status:
+        query = query.where(model.status == status)
+    if campaign_id is not None:
+        query = query.where(~exists().where(CampaignRecipient.campaign_id == campaign_id,
+                                            CampaignRecipient.email == email))
+    return query
+
+def count_recipients(segment):
+    """Count the distinct addresses in a segment."""
+    from sqlalchemy import select, func
+    from models import db
+
+    return db.session.execute(select(func.count()).select_from(segment_query(segment).subquery())).scalar()
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of provider API calls.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts are allowed without exceeding the long-run rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize the bucket (full).
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (defaults to rate, i.e. one second of burst)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, stop_event=None):
+        """
+        Take tokens, sleeping until enough are available.
+
+        Args:
+            tokens: Tokens to take
+            stop_event: Optional threading.Event that aborts the wait when set
+
+        Returns:
+            True once the tokens were taken, False if stop_event was set first
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+class DatabaseRateLimiter:
+    """
+    Rate limit shared by every process through a counter row in PostgreSQL.
+
+    A TokenBucket only limits its own process, so gunicorn workers and
+    standalone runners would each send at the full rate. Here each call
+    counts against a fixed time window in the rate_limit_windows table with
+    one atomic upsert; when the window is full the caller sleeps until the
+    next one. Windows are timed by the database clock, so hosts don't need
+    synchronised clocks.
+    """
+
+    def __init__(self, app, name, rate):
+        """
+        Args:
+            app: Flask application (for the database engine)
+            name: Limit name (row key), shared by everything drawing on the same limit
+            rate: Calls per second across all processes
+        """
+        self.app = app
+        self.name = name
+        self.rate = rate
+        # Sub-1/s rates use longer windows of one call each
+        self.window_seconds = max(1.0, 1.0 / rate)
+        self.per_window = max(1, int(rate * self.window_seconds))
+        self._fallback = TokenBucket(rate)
+
+    def _take(self, tokens):
+        """Count tokens against the current window; returns False if it is full."""
+        from sqlalchemy import text
+        from models import db
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                row = conn.execute(text(
+                    "INSERT INTO rate_limit_windows AS w (name, window_start, used) "
+                    "VALUES (:name, floor(extract(epoch from clock_timestamp()) / :seconds)::bigint, :tokens) "
+                    "ON CONFLICT (name) DO UPDATE SET "
+                    "used = CASE WHEN w.window_start = EXCLUDED.window_start THEN w.used + EXCLUDED.used ELSE EXCLUDED.used END, "
+                    "window_start = EXCLUDED.window_start "
+                    "WHERE w.window_start <> EXCLUDED.window_start OR w.used + EXCLUDED.used <= :limit "
+                    "RETURNING w.used"
+                ), {'name': self.name, 'seconds': self.window_seconds, 'tokens': tokens, 'limit': self.per_window}).first()
+        return row is not None
+
+    def acquire(self, tokens=1, stop_event=None):
+        """
+        Take tokens, sleeping until the shared window has room (same interface as TokenBucket.acquire).
+
+        Returns:
+            True once the tokens were taken, False if stop_event was set first
+        """
+        while True:
+            try:
+                if self._take(tokens):
+                    return True
+                wait = self.window_seconds - time.time() % self.window_seconds
+            except Exception as e:
+                # Keep sending at the local rate rather than stalling the campaign
+                logger.warning(f"Shared rate limit unavailable, limiting this process only: {e}")
+                return self._fallback.acquire(tokens, stop_event=stop_event)
+
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+class CampaignWorker:
+    """
+    Background runner for queued email campaigns.
+
+    One coordinator thread per process claims a queued campaign with
+    SELECT ... FOR UPDATE SKIP LOCKED and streams its recipients from a
+    server-side cursor, so the segment is never loaded into memory. Batches of
+    recipients go through a bounded queue to a pool of sender threads, which
+    share a rate limiter so the provider's rate limit is respected: on
+    PostgreSQL a DatabaseRateLimiter shared by every process, otherwise a
+    per-process TokenBucket. The coordinator writes per-recipient results and counters in batches
+    and refreshes a heartbeat; a campaign whose heartbeat goes stale (the
+    process died) is picked up again and resumes with the addresses that have
+    no result yet.
+    """
+
+    def __init__(self, app, workers=None, rate=None, batch_size=None, poll_interval=None, stale_after=120):
+        """
+        Initialize the runner.
+
+        Args:
+            app: Flask application (threads run inside its app context)
+            workers: Sender threads per campaign (defaults to CAMPAIGN_WORKERS or 2)
+            rate: Provider API calls per second across all processes (defaults to CAMPAIGN_RATE_LIMIT or 2)
+            batch_size: Recipients per API call (defaults to CAMPAIGN_BATCH_SIZE or 50)
+            poll_interval: Seconds between polls for queued campaigns (defaults to CAMPAIGN_POLL_INTERVAL or 30)
+            stale_after: Seconds without a heartbeat before a running campaign is taken over
+        """
+        self.app = app
+        self.workers = workers or int(os.getenv('CAMPAIGN_WORKERS', '2'))
+        self.rate = rate or float(os.getenv('CAMPAIGN_RATE_LIMIT', '2'))
+        self.batch_size = batch_size or int(os.getenv('CAMPAIGN_BATCH_SIZE', '50'))
+        self.poll_interval = poll_interval or float(os.getenv('CAMPAIGN_POLL_INTERVAL', '30'))
+        self.stale_after = stale_after
+
+        if app.config.get('SQLALCHEMY_DATABASE_URI', '').startswith('postgresql'):
+            self.bucket = DatabaseRateLimiter(app, 'email_campaigns', self.rate)
+        else:
+            self.bucket = TokenBucket(self.rate)
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.campaigns = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the coordinator thread."""
+        self._thread = threading.Thread(target=self._run, name='email-campaigns', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the coordinator to exit; a running campaign stops after its in-flight batches."""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def is_alive(self):
+        """Check whether the coordinator thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        """Have the coordinator look for queued campaigns now."""
+        self._wake_event.set()
+
+    def _run(self):
+        """Claim and run campaigns until stopped."""
+        while not self._stop_event.is_set():
+            campaign_id = None
+            try:
+                with self.app.app_context():
+                    campaign_id = self.claim()
+                    if campaign_id is not None:
+                        self.run_campaign(campaign_id)
+            except Exception as e:
+                logger.error(f"Email campaign worker error: {e}")
+                if campaign_id is not None:
+                    self.mark_failed(campaign_id, str(e))
+
+            if campaign_id is None:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+
+    def claim(self):
+        """
+        Claim the oldest queued campaign, or a running one whose worker died.
+
+        Returns:
+            EmailCampaign ID, or None if there is nothing to run
+        """
+        from models import db, EmailCampaign
+
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.stale_after)
+        campaign = (EmailCampaign.query
+                    .filter(db.or_(EmailCampaign.status == 'queued',
+                                   db.and_(EmailCampaign.status == 'running',
+                                           EmailCampaign.heartbeat_at < stale)))
+                    .order_by(EmailCampaign.created_at)
+                    .with_for_update(skip_locked=True)
+                    .first())
+        if campaign is None:
+            db.session.rollback()
+            return None
+
+        campaign.status = 'running'
+        campaign.heartbeat_at = now
+        campaign.started_at = campaign.started_at or now
+        db.session.commit()
+        return campaign.id
+
+    def stream_recipients(self, campaign):
+        """
+        Stream the campaign's remaining recipients in batches.
+
+        Uses its own connection with a server-side cursor, so only one
+        cursor page (yield_per rows) is held in memory at a time.
+
+        Yields:
+            Lists of (id, email) rows, batch_size at a time
+        """
+        from models import db
+
+        query = segment_query(campaign.segment, campaign_id=campaign.id)
+        with db.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=self.batch_size * 10).execute(query)
+            for partition in result.partitions(self.batch_size):
+                yield partition
+
+    def run_campaign(self, campaign_id):
+        """
+        Send a claimed campaign to every remaining recipient in its segment.
+
+        Args:
+            campaign_id: EmailCampaign ID (status 'running')
+        """
+        from models import db, EmailCampaign
+        from email_service import get_email_service
+
+        email_service = get_email_service()
+        campaign = db.session.get(EmailCampaign, campaign_id)
+        message = {'subject': campaign.subject, 'html': campaign.html_content, 'from': campaign.from_email}
+        logger.info(f"Running email campaign {campaign_id} ({campaign.segment})")
+
+        batches = queue.Queue(maxsize=self.workers * 2)  # Backpressure on the cursor
+        results = queue.Queue()
+        cancelled = threading.Event()
+        senders = [threading.Thread(target=self._send_batches, args=(campaign_id, email_service, message, batches, results, cancelled),
+                                    name=f'email-campaign-{campaign_id}-{i}', daemon=True)
+                   for i in range(self.workers)]
+        for sender in senders:
+            sender.start()
+
+        try:
+            for recipients in self.stream_recipients(campaign):
+                while not cancelled.is_set():
+                    try:
+                        batches.put(recipients, timeout=1)
+                        break
+                    except queue.Full:
+                        self.record_progress(campaign_id, results, cancelled)
+                if cancelled.is_set() or self._stop_event.is_set():
+                    break
+                self.record_progress(campaign_id, results, cancelled)
+        finally:
+            for sender in senders:
+                batches.put(None)
+            while any(sender.is_alive() for sender in senders):
+                self.record_progress(campaign_id, results, cancelled)
+                for sender in senders:
+                    sender.join(timeout=1)
+
+        self.record_progress(campaign_id, results, cancelled)
+
+        campaign = db.session.get(EmailCampaign, campaign_id)
+        if campaign.status == 'cancelled':
+            campaign.finished_at = campaign.finished_at or datetime.utcnow()
+        elif not self._stop_event.is_set():
+            campaign.status = 'completed'
+            campaign.finished_at = datetime.utcnow()
+        # If the process is shutting down it stays 'running' and is resumed once its heartbeat goes stale
+        db.session.commit()
+
+        self.campaigns += 1
+        logger.info(f"Email campaign {campaign_id} finished: {campaign.sent} sent, {campaign.failed} failed")
+
+    def _send_batches(self, campaign_id, email_service, message, batches, results, cancelled):
+        """Sender thread: deliver recipient batches at the bucket's rate until the sentinel."""
+        while True:
+            recipients = batches.get()
+            if recipients is None:
+                return
+            if cancelled.is_set() or self._stop_event.is_set():
+                continue  # Drain without sending; these stay unrecorded and are resumed later
+            messages = [dict(message, to=row.email, idempotency_key=f"campaign-{campaign_id}-{row.email}")
+                        for row in recipients]
+            sent = self._send_when_available(email_service, messages, cancelled)
+            if sent is not None:
+                results.put((recipients, sent))
+
+    def _send_when_available(self, email_service, messages, cancelled):
+        """
+        Send one batch at the bucket's rate, waiting out an open circuit breaker instead of recording failures.
+
+        Returns:
+            List of result dicts, or None if stopped or cancelled before the batch was sent
+        """
+        while self.bucket.acquire(stop_event=self._stop_event):
+            try:
+                sent = email_service.send_messages(messages)
+            except Exception as e:
+                sent = [{'success': False, 'error': str(e)} for message in messages]
+
+            deferred = [result.get('retry_after') or 0 for result in sent if result.get('circuit_open')]
+            if not deferred:
+                return sent
+            if cancelled.is_set() or self._stop_event.wait(max(max(deferred), 1)):
+                return None
+        return None
+
+    def record_progress(self, campaign_id, results, cancelled):
+        """
+        Write finished batches to campaign_recipients and update the campaign counters.
+
+        Also refreshes the heartbeat and picks up a cancel from the admin.
+
+        Args:
+            campaign_id: EmailCampaign ID
+            results: Queue of (recipients, result dicts) from the sender threads
+            cancelled: Event set here when the campaign has been cancelled
+        """
+        from models import db, EmailCampaign, CampaignRecipient
+
+        sent = failed = 0
+        while True:
+            try:
+                recipients, batch_results = results.get_nowait()
+            except queue.Empty:
+                break
+            for row, result in zip(recipients, batch_results):
+                success = bool(result.get('success'))
+                db.session.add(CampaignRecipient(
+                    campaign_id=campaign_id,
+                    recipient_id=row.id,
+                    email=row.email,
+                    status='sent' if success else 'failed',
+                    email_id=result.get('email_id'),
+                    error=None if success else result.get('error', 'Unknown error')
+                ))
+                if success:
+                    sent += 1
+                else:
+                    failed += 1
+
+        campaign = db.session.get(EmailCampaign, campaign_id, with_for_update=True, populate_existing=True)
+        campaign.sent += sent
+        campaign.failed += failed
+        campaign.heartbeat_at = datetime.utcnow()
+        if campaign.status == 'cancelled':
+            cancelled.set()
+        db.session.commit()
+
+        self.sent += sent
+        self.failed += failed
+
+    def mark_failed(self, campaign_id, error):
+        """Stop a campaign that hit an unexpected error."""
+        from models import db, EmailCampaign
+
+        try:
+            with self.app.app_context():
+                campaign = db.session.get(EmailCampaign, campaign_id)
+                campaign.status = 'failed'
+                campaign.last_error = error
+                campaign.finished_at = datetime.utcnow()
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Could not mark email campaign {campaign_id} failed: {e}")
+
+    def stats(self):
+        """Get runner counters."""
+        return {
+            'workers': self.workers,
+            'rate_limit': self.rate,
+            'alive': self.is_alive(),
+            'campaigns': self.campaigns,
+            'sent': self.sent,
+            'failed': self.failed
+        }
+
+# Global instance
+_campaign_worker = None
+_campaign_worker_pid = None
+_campaign_worker_lock = threading.Lock()
+
+def start_campaign_worker(app):
+    """
+    Start the campaign runner for this process if it isn't running.
+
+    Safe to call on every request: the runner is started lazily and once per
+    (forked) gunicorn worker process.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        The running CampaignWorker
+    """
+    global _campaign_worker, _campaign_worker_pid
+    if _campaign_worker is not None and _campaign_worker_pid == os.getpid():
+        return _campaign_worker
+    with _campaign_worker_lock:
+        if _campaign_worker is None or _campaign_worker_pid != os.getpid():
+            _campaign_worker = CampaignWorker(app)
+            _campaign_worker_pid = os.getpid()
+            _campaign_worker.start()
+    return _campaign_worker
+
+def get_campaign_worker():
+    """Get this process's campaign runner, if one was started."""
+    if _campaign_worker_pid != os.getpid():
+        return None
+    return _campaign_worker
+
+def wake_campaigns():
+    """Wake this process's campaign runner after queueing a campaign."""
+    worker = get_campaign_worker()
+    if worker is not None:
+        worker.wake()
@@ -0,0 +1,522 @@
+"""Durable outbox for transactional email, drained by a background worker pool.
+
+With EMAIL_OUTBOX_ENABLED=false the web processes only queue emails; run this
+module to deliver them instead:
+
+    python email_outbox.py           # Standalone worker pool
+    python email_outbox.py --once    # Send everything due now and exit (e.g. from cron)
+"""
+import os
+import re
+import random
+import threading
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Admin notifications that may be folded into a digest
+DIGEST_KINDS = {'contact_notification', 'investor_notification'}
+
+def digest_enabled():
+    """Check whether admin notifications are buffered into digests."""
+    return os.getenv('ADMIN_DIGEST_ENABLED', 'false').lower() == 'true'
+
+def notification_priority(*texts):
+    """
+    Get the priority of an admin notification from its submitted text.
+
+    Args:
+        *texts: Submitted fields to scan (e.g. the contact subject)
+
+    Returns:
+        'high' if any ADMIN_DIGEST_URGENT_KEYWORDS appear, otherwise 'normal'
+    """
+    keywords = [k.strip().lower() for k in os.getenv('ADMIN_DIGEST_URGENT_KEYWORDS', 'urgent,asap').split(',') if k.strip()]
+    content = ' '.join(text for text in texts if text).lower()
+    # Whole words only, so 'asap' doesn't match 'Asaph'
+    return 'high' if any(re.search(rf'\b{re.escape(keyword)}\b', content) for keyword in keywords) else 'normal'
+
+def meeting_priority(meeting_date):
+    """
+    Get the priority of an investor booking notification from the requested meeting time.
+
+    Args:
+        meeting_date: Requested time as submitted (ISO format, e.g. '2026-05-01T14:30')
+
+    Returns:
+        'high' if the meeting is within ADMIN_DIGEST_URGENT_DAYS (default 2) or the
+        date can't be read, otherwise 'normal'
+    """
+    days = float(os.getenv('ADMIN_DIGEST_URGENT_DAYS', '2'))
+    try:
+        meeting_at = datetime.fromisoformat(str(meeting_date))
+    except ValueError:
+        return 'high'  # Let the admin read it now rather than bury it in a digest
+    return 'high' if meeting_at - datetime.now(meeting_at.tzinfo) <= timedelta(days=days) else 'normal'
+
+def enqueue_email(message, kind='email', priority='normal'):
+    """
+    Add a message to the outbox in the current database transaction.
+
+    The row is only committed (and the message only sent) if the caller's
+    transaction commits, so an email is never sent for a rolled-back insert.
+    Call wake_outbox() after committing to have it delivered straight away.
+
+    In digest mode, normal-priority admin notifications are buffered and later
+    sent as a single digest email; high-priority ones are sent immediately.
+
+    Args:
+        message: dict with 'to', 'subject', 'html' and optional 'text' and 'from' (see EmailService.build_*)
+        kind: Short label for the message type
+        priority: 'high' to bypass the admin digest
+
+    Returns:
+        EmailOutbox row, or None if there was no message to send
+    """
+    from models import db, EmailOutbox
+
+    if not message:
+        return None
+
+    buffered = kind in DIGEST_KINDS and priority != 'high' and digest_enabled()
+
+    outbox_email = EmailOutbox(
+        kind=kind,
+        to_email=message['to'],
+        from_email=message.get('from'),
+        subject=message['subject'],
+        html_content=message['html'],
+        text_content=message.get('text'),
+        status='digest' if buffered else 'pending',
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(outbox_email)
+    return outbox_email
+
+class OutboxWorker:
+    """
+    Pool of background threads delivering emails from the outbox.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    threads and gunicorn workers can drain the same table. A claimed row is
+    leased by pushing next_attempt_at forward; if the process dies mid-send
+    the lease expires and another worker picks the row up. Failed sends are
+    retried with exponential backoff and moved to 'dead' after max_attempts.
+
+    New rows claimed together go out as one batch API call. The batch's
+    idempotency key is stored on its rows (batch_key) before sending, and a
+    batch whose outcome is unknown (a timeout, a 5xx, a lost lease) is retried
+    as exactly the same batch under the same key, so the provider can drop a
+    repeat of a batch it already accepted. The rows share one retry time to
+    stay together. Other retries go one message at a time under the row's own
+    outbox-<id> key.
+    While the email service's circuit breaker is open, rows are left pending
+    (or deferred, if the breaker opened mid-batch) without using up attempts.
+
+    Buffered admin notifications (status 'digest') are folded into one digest
+    email once digest_max_items have accumulated or the oldest is
+    digest_interval seconds old. Folded rows are marked 'digested'.
+    """
+
+    def __init__(self, app, workers=None, poll_interval=None, max_attempts=None,
+                 base_delay=None, max_delay=None, batch_size=10, lease=300,
+                 digest_interval=None, digest_max_items=None):
+        """
+        Initialize the worker pool.
+
+        Args:
+            app: Flask application (threads run inside its app context)
+            workers: Number of delivery threads (defaults to EMAIL_OUTBOX_WORKERS or 2)
+            poll_interval: Seconds between polls when idle (defaults to EMAIL_OUTBOX_POLL_INTERVAL or 30)
+            max_attempts: Attempts before dead-lettering (defaults to EMAIL_OUTBOX_MAX_ATTEMPTS or 6)
+            base_delay: Seconds before the first retry (defaults to EMAIL_OUTBOX_RETRY_DELAY or 30)
+            max_delay: Upper bound on the retry delay in seconds (defaults to 3600)
+            batch_size: Rows claimed per poll
+            lease: Seconds a claimed row is reserved for the claiming thread
+            digest_interval: Max seconds a notification waits for a digest (defaults to ADMIN_DIGEST_INTERVAL or 900)
+            digest_max_items: Notifications that trigger a digest early (defaults to ADMIN_DIGEST_MAX_ITEMS or 20)
+        """
+        self.app = app
+        self.workers = workers or int(os.getenv('EMAIL_OUTBOX_WORKERS', '2'))
+        self.poll_interval = poll_interval or float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '30'))
+        self.max_attempts = max_attempts or int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+        self.base_delay = base_delay or float(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', '30'))
+        self.max_delay = max_delay or 3600
+        self.batch_size = batch_size
+        self.lease = lease
+        self.digest_interval = digest_interval or float(os.getenv('ADMIN_DIGEST_INTERVAL', '900'))
+        self.digest_max_items = digest_max_items or int(os.getenv('ADMIN_DIGEST_MAX_ITEMS', '20'))
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        # Counters
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self.deferred = 0
+        self.digests = 0
+
+    def start(self):
+        """Start the delivery threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'email-outbox-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Ask the delivery threads to exit after their current batch."""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def is_alive(self):
+        """Check whether any delivery thread is running."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def wake(self):
+        """Have an idle thread poll the outbox now instead of waiting for the next interval."""
+        self._wake_event.set()
+
+    def retry_delay(self, attempts, batch_key=None):
+        """
+        Get the backoff delay after a given number of failed attempts, with jitter.
+
+        Rows of one batch (same batch_key) get the same jitter, so they fall due together.
+        """
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        rng = random.Random(f'{batch_key}-{attempts}') if batch_key else random
+        return delay * rng.uniform(0.8, 1.2)
+
+    def _run(self):
+        """Claim and deliver emails until stopped."""
+        while not self._stop_event.is_set():
+            delivered = 0
+            try:
+                with self.app.app_context():
+                    delivered = self.process_batch()
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+
+            # Keep draining while there is work, otherwise sleep until woken
+            if delivered < self.batch_size:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+
+    def drain(self):
+        """
+        Deliver everything that is due now, in this thread, then return.
+
+        Returns:
+            Number of emails claimed
+        """
+        total = 0
+        with self.app.app_context():
+            while True:
+                claimed = self.process_batch()
+                total += claimed
+                if not claimed:
+                    return total
+
+    def claim(self):
+        """
+        Claim due emails for this thread, grouped into sends.
+
+        Rows already sent in a batch are only claimed together with the rest
+        of that batch; if another thread holds part of it, the batch is left
+        for a later poll. New rows claimed together get a fresh batch key.
+
+        Returns:
+            List of (batch_key, [(id, message), ...]); each group is sent as one
+            batch under batch_key, or one message at a time if batch_key is None
+        """
+        from models import db, EmailOutbox
+        from email_service import batch_idempotency_key
+
+        now = datetime.utcnow()
+        rows = (EmailOutbox.query
+                .filter(EmailOutbox.status.in_(['pending', 'sending']),
+                        EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all())
+
+        batches = {}
+        fresh = []
+        single = []
+        for row in rows:
+            if row.batch_key:
+                batches.setdefault(row.batch_key, {})[row.id] = row
+            elif row.status == 'pending' and row.attempts == 0:
+                fresh.append(row)
+            else:
+                single.append(row)  # Retried, or its lease expired: it went out under its own key
+
+        # Complete each earlier batch, or skip it if another thread holds part of it
+        if batches:
+            unsent = (EmailOutbox.query
+                      .filter(EmailOutbox.batch_key.in_(batches), EmailOutbox.status.in_(['pending', 'sending']))
+                      .with_for_update(skip_locked=True)
+                      .all())
+            locked = {}
+            for row in unsent:
+                locked.setdefault(row.batch_key, {})[row.id] = row
+            totals = dict(db.session.query(EmailOutbox.batch_key, db.func.count())
+                          .filter(EmailOutbox.batch_key.in_(batches), EmailOutbox.status.in_(['pending', 'sending']))
+                          .group_by(EmailOutbox.batch_key)
+                          .all())
+            for batch_key in list(batches):
+                group = locked.get(batch_key, {})
+                if len(group) == totals.get(batch_key) and all(row.next_attempt_at <= now for row in group.values()):
+                    batches[batch_key] = group
+                else:
+                    del batches[batch_key]
+
+        def message(row):
+            return {
+                'to': row.to_email,
+                'from': row.from_email,
+                'subject': row.subject,
+                'html': row.html_content,
+                'text': row.text_content,
+                'idempotency_key': f'outbox-{row.id}'  # A retry after a timeout isn't delivered twice
+            }
+
+        if len(fresh) > 1:
+            fresh.sort(key=lambda row: row.id)
+            batch_key = batch_idempotency_key([message(row) for row in fresh])
+            for row in fresh:
+                row.batch_key = batch_key
+            batches[batch_key] = {row.id: row for row in fresh}
+        else:
+            single.extend(fresh)
+
+        claimed = []
+        for batch_key, group in batches.items():
+            claimed.append((batch_key, [(row.id, message(row)) for row in sorted(group.values(), key=lambda row: row.id)]))
+        if single:
+            claimed.append((None, [(row.id, message(row)) for row in single]))
+
+        for batch_key, group in claimed:
+            for outbox_id, _ in group:
+                row = db.session.get(EmailOutbox, outbox_id)
+                row.status = 'sending'
+                row.next_attempt_at = now + timedelta(seconds=self.lease)
+        db.session.commit()
+        return claimed
+
+    def process_batch(self):
+        """
+        Deliver the emails claimed in one poll.
+
+        Returns:
+            Number of emails claimed
+        """
+        from email_service import get_email_service
+
+        # Fail before claiming anything if the email service isn't configured
+        email_service = get_email_service()
+
+        self.flush_digest(email_service)
+
+        # Leave rows unclaimed while the circuit breaker is failing fast
+        if not email_service.available():
+            return 0
+
+        claimed = self.claim()
+        for batch_key, group in claimed:
+            messages = [message for outbox_id, message in group]
+            if batch_key:
+                # Same rows in the same order give the same batch idempotency key on every attempt
+                results = email_service.send_batch(messages)
+            else:
+                results = [email_service.send_message(message) for message in messages]
+            self.record_results([outbox_id for outbox_id, message in group], results)
+        return sum(len(group) for batch_key, group in claimed)
+
+    def flush_digest(self, email_service, force=False):
+        """
+        Fold buffered admin notifications into digest emails when one is due.
+
+        The digest is queued as a normal outbox row, so it gets the same
+        retries and dead-lettering as any other email.
+
+        Args:
+            email_service: EmailService used to build the digest
+            force: Flush regardless of the interval and item thresholds
+
+        Returns:
+            Number of notifications folded into digests
+        """
+        from models import db, EmailOutbox
+
+        rows = (EmailOutbox.query
+                .filter_by(status='digest')
+                .order_by(EmailOutbox.created_at)
+                .with_for_update(skip_locked=True)
+                .all())
+        if not rows:
+            db.session.rollback()
+            return 0
+
+        now = datetime.utcnow()
+        oldest = rows[0].created_at
+        if not force and len(rows) < self.digest_max_items and oldest > now - timedelta(seconds=self.digest_interval):
+            db.session.rollback()
+            return 0
+
+        by_recipient = {}
+        for row in rows:
+            by_recipient.setdefault(row.to_email, []).append(row)
+
+        for admin_email, recipient_rows in by_recipient.items():
+            digest = email_service.build_admin_digest(
+                [{'kind': row.kind, 'html': row.html_content, 'text': row.text_content, 'created_at': row.created_at}
+                 for row in recipient_rows],
+                admin_email=admin_email
+            )
+            enqueue_email(digest, kind='admin_digest', priority='high')
+            for row in recipient_rows:
+                row.status = 'digested'
+                row.sent_at = now
+        db.session.commit()
+
+        self.digests += len(by_recipient)
+        logger.info(f"Folded {len(rows)} admin notifications into {len(by_recipient)} digest(s)")
+        return len(rows)
+
+    def record_results(self, outbox_ids, results):
+        """
+        Record the outcome of a batch of sends in one transaction.
+
+        Args:
+            outbox_ids: EmailOutbox row IDs
+            results: Result dicts from EmailService, in the same order
+        """
+        from models import db
+
+        now = datetime.utcnow()  # One retry time for a whole batch
+        for outbox_id, result in zip(outbox_ids, results):
+            self.record_result(outbox_id, result, now=now)
+        db.session.commit()
+
+    def record_result(self, outbox_id, result, now=None):
+        """
+        Mark an email sent, or schedule a retry / dead-letter it after a failure.
+
+        The change is left uncommitted for the caller.
+
+        Args:
+            outbox_id: EmailOutbox row ID
+            result: dict returned by EmailService
+            now: Time the send finished (defaults to now)
+        """
+        from models import db, EmailOutbox
+
+        row = db.session.get(EmailOutbox, outbox_id)
+        if row is None:
+            return
+
+        now = now or datetime.utcnow()
+        if result.get('sent_individually'):
+            row.batch_key = None  # The batch was rejected and this row resent under its own key; retry it alone
+        if result.get('success'):
+            row.status = 'sent'
+            row.email_id = result.get('email_id')
+            row.sent_at = now
+            row.last_error = None
+            self.sent += 1
+        elif result.get('circuit_open'):
+            # Never attempted: defer until the breaker lets calls through, without using up an attempt
+            row.status = 'pending'
+            row.last_error = result.get('error')
+            row.next_attempt_at = now + timedelta(seconds=result.get('retry_after') or self.base_delay)
+            self.deferred += 1
+        else:
+            row.attempts += 1
+            row.last_error = result.get('error', 'Unknown error')
+            if row.attempts >= self.max_attempts:
+                row.status = 'dead'
+                self.dead += 1
+                logger.error(f"Email {outbox_id} to {row.to_email} dead-lettered after {row.attempts} attempts: {row.last_error}")
+            else:
+                row.status = 'pending'
+                row.next_attempt_at = now + timedelta(seconds=self.retry_delay(row.attempts, row.batch_key))
+                self.failed += 1
+                logger.warning(f"Email {outbox_id} failed (attempt {row.attempts}), retrying at {row.next_attempt_at}: {row.last_error}")
+
+    def stats(self):
+        """Get worker counters."""
+        return {
+            'workers': self.workers,
+            'alive': self.is_alive(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'dead': self.dead,
+            'deferred': self.deferred,
+            'digests': self.digests
+        }
+
+# Global instance
+_outbox_worker = None
+_outbox_worker_pid = None
+_outbox_worker_lock = threading.Lock()
+
+def start_outbox_worker(app):
+    """
+    Start the outbox worker pool for this process if it isn't running.
+
+    Safe to call on every request: gunicorn forks workers after import, so the
+    pool is started lazily and once per process.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        The running OutboxWorker
+    """
+    global _outbox_worker, _outbox_worker_pid
+    if _outbox_worker is not None and _outbox_worker_pid == os.getpid():
+        return _outbox_worker
+    with _outbox_worker_lock:
+        if _outbox_worker is None or _outbox_worker_pid != os.getpid():
+            _outbox_worker = OutboxWorker(app)
+            _outbox_worker_pid = os.getpid()
+            _outbox_worker.start()
+    return _outbox_worker
+
+def get_outbox_worker():
+    """Get this process's outbox worker, if one was started."""
+    if _outbox_worker_pid != os.getpid():
+        return None
+    return _outbox_worker
+
+def wake_outbox():
+    """Wake this process's outbox worker after committing new emails."""
+    worker = get_outbox_worker()
+    if worker is not None:
+        worker.wake()
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description='Deliver queued emails from the outbox.')
+    parser.add_argument('--once', action='store_true', help='Send everything due now and exit')
+    args = parser.parse_args()
+
+    from app import app
+    import email_outbox  # The module app.py uses, not this __main__ copy
+
+    worker = email_outbox.OutboxWorker(app)
+    if args.once:
+        print(f"Processed {worker.drain()} queued emails: {worker.stats()}")
+    else:
+        worker.start()
+        print(f"Outbox worker running with {worker.workers} threads (Ctrl+C to stop)")
+        try:
+            while worker.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
@@ -1,28 +1,199 @@
 """Email service for sending emails via Resend."""
 import os
-import resend
+import time
+import hashlib
+import threading
 import logging
+from collections import deque
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+from email_transports import CircuitBreaker, CircuitOpenError, create_transport, is_transient_error
 
 logger = logging.getLogger(__name__)
 
+# Platform display names
+PLATFORM_NAMES = {
+    'google_meet': 'Google Meet',
+    'zoom': 'Zoom',
+    'whatsapp': 'WhatsApp',
+    'phone': 'Direct Phone Call'
+}
+
+# Email templates, compiled once when the service is created
+EMAIL_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+EMAIL_TEMPLATES = (
+    'contact_notification',
+    'contact_confirmation',
+    'investor_notification',
+    'investor_confirmation',
+    'admin_digest'
+)
+
+def _nl2br(value):
+    """Escape text and turn newlines into <br> tags."""
+    return Markup('<br>').join(escape(value or '').split('\n'))
+
+def _isoformat(value):
+    """Format a datetime (or pass through a string) for display."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value or 'N/A'
+
+def create_email_environment():
+    """Create the Jinja environment for email templates."""
+    env = Environment(
+        loader=FileSystemLoader(EMAIL_TEMPLATE_DIR),
+        autoescape=select_autoescape(default=True),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True
+    )
+    env.filters['nl2br'] = _nl2br
+    env.filters['isoformat'] = _isoformat
+    env.filters['platform_name'] = lambda platform: PLATFORM_NAMES.get(platform or '', platform or 'N/A')
+    return env
+
+# Maximum number of emails Resend accepts in one batch request
+BATCH_LIMIT = 100
+
+class LatencyStats:
+    """Thread-safe rolling latency figures for API calls."""
+    
+    def __init__(self, window=500):
+        """
+        Args:
+            window: Number of recent calls used for the percentiles
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, latency_ms, error=False):
+        """Record one call."""
+        with self._lock:
+            self._samples.append(latency_ms)
+            self.calls += 1
+            self.errors += 1 if error else 0
+            self.total_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+    
+    def snapshot(self):
+        """Get call counts and latency percentiles in milliseconds."""
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, errors, total_ms, max_ms = self.calls, self.errors, self.total_ms, self.max_ms
+        
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1) if samples else None
+        
+        return {
+            'calls': calls,
+            'errors': errors,
+            'avg_ms': round(total_ms / calls, 1) if calls else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(max_ms, 1)
+        }
+
+def batch_idempotency_key(messages):
+    """
+    Derive an Idempotency-Key for a batch from its messages' keys.
+    
+    Returns None unless every message has a key, since a partial key would
+    let Resend drop a batch that contains new messages.
+    """
+    keys = [message.get('idempotency_key') for message in messages]
+    if not keys or not all(keys):
+        return None
+    return 'batch-' + hashlib.sha256('\n'.join(keys).encode('utf-8')).hexdigest()[:32]
+
 class EmailService:
-    """Service for sending emails via Resend API."""
+    """Service for sending emails via Resend API (or a local transport, see EMAIL_TRANSPORT)."""
+    
+    def __init__(self, transport=None, breaker=None):
+        """
+        Initialize the transport and load the email templates.
+        
+        Args:
+            transport: EmailTransport to deliver with (defaults to create_transport(), i.e. EMAIL_TRANSPORT)
+            breaker: CircuitBreaker guarding the transport (defaults to one configured from env)
+        """
+        self.transport = transport or create_transport()
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyStats()
+        
+        # Load and compile all email templates up front
+        self.template_env = create_email_environment()
+        self.templates = {name: self.template_env.get_template(f'{name}.html') for name in EMAIL_TEMPLATES}
     
-    def __init__(self):
-        """Initialize Resend client with API key from environment."""
-        api_key = os.getenv('RESEND_API_KEY')
-        if not api_key:
-            raise ValueError("RESEND_API_KEY environment variable is not set")
+    def _deliver(self, send, *args, **kwargs):
+        """
+        Call a transport method through the circuit breaker, recording its latency.
         
-        resend.api_key = api_key
+        Returns:
+            Tuple of (transport result, latency in milliseconds)
         
-        # Try to initialize Resend client (newer versions)
+        Raises:
+            CircuitOpenError without calling the transport while the breaker is open,
+            otherwise whatever the transport raised
+        """
+        self.breaker.before_call()
+        
+        start = time.perf_counter()
         try:
-            self.resend_client = resend.Resend(api_key=api_key)
-        except (AttributeError, TypeError):
-            self.resend_client = None
+            result = send(*args, **kwargs)
+        except Exception as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            self.latency.record(latency_ms, error=True)
+            if is_transient_error(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.latency.record(latency_ms)
+        self.breaker.record_success()
+        logger.debug(f"{self.transport.name} send took {latency_ms:.0f}ms")
+        return result, latency_ms
+    
+    def available(self):
+        """Check whether sends are currently allowed (the circuit breaker isn't open)."""
+        return self.breaker.retry_after() == 0
+    
+    def stats(self):
+        """Get transport call counts, latency and circuit breaker state."""
+        stats = dict(self.latency.snapshot(), transport=self.transport.name, breaker=self.breaker.stats())
+        if hasattr(self.transport, 'stats'):
+            stats.update(self.transport.stats())
+        return stats
+    
+    def render_email(self, name, **context):
+        """
+        Render an email template's subject, HTML and plain-text variants in one pass.
+        
+        Each template sets `subject`, `html` and `text` at the top level; rendering
+        it as a module evaluates the template once and exposes all three.
+        
+        Args:
+            name: Template name (see EMAIL_TEMPLATES)
+            **context: Template variables
+        
+        Returns:
+            dict with 'subject', 'html' and 'text'
+        """
+        module = self.templates[name].make_module(context)
+        return {
+            # Subject and text are captured with HTML escaping; undo it for plain text
+            'subject': Markup(module.subject).unescape().strip(),
+            'html': str(module.html).strip(),
+            'text': Markup(module.text).unescape().strip()
+        }
     
-    def send_email(self, to_email, subject, html_content, from_email=None):
+    def send_email(self, to_email, subject, html_content, from_email=None, text_content=None, idempotency_key=None):
         """
         Send an email via Resend.
         
@@ -31,51 +202,40 @@ class EmailService:
             subject: Email subject
             html_content: HTML content of the email
             from_email: Sender email (defaults to env variable or default)
+            text_content: Plain-text alternative (optional)
+            idempotency_key: Key that makes retries of this send safe (optional)
         
         Returns:
-            dict with 'success', 'email_id' or 'error'
+            dict with 'success', 'email_id' and 'latency_ms', or 'error'
         """
         try:
             # Get from email
             if not from_email:
                 from_email = os.getenv('RESEND_FROM_EMAIL', 'onboarding@resend.dev')
             
-            # Send email
-            if self.resend_client:
-                try:
-                    result = self.resend_client.emails.send({
-                        "from": from_email,
-                        "to": to_email,
-                        "subject": subject,
-                        "html": html_content
-                    })
-                except (AttributeError, TypeError):
-                    # Fallback to module-level API
-                    result = resend.Emails.send({
-                        "from": from_email,
-                        "to": to_email,
-                        "subject": subject,
-                        "html": html_content
-                    })
-            else:
-                result = resend.Emails.send({
-                    "from": from_email,
-                    "to": to_email,
-                    "subject": subject,
-                    "html": html_content
-                })
+            params = {
+                "from": from_email,
+                "to": to_email,
+                "subject": subject,
+                "html": html_content
+            }
+            if text_content:
+                params["text"] = text_content
             
-            # Extract email ID from result
-            email_id = None
-            if isinstance(result, dict):
-                email_id = result.get('id')
-            elif hasattr(result, 'id'):
-                email_id = result.id
+            email_id, latency_ms = self._deliver(self.transport.send, params, idempotency_key=idempotency_key)
             
             return {
                 'success': True,
                 'email_id': email_id,
-                'result': result
+                'latency_ms': round(latency_ms, 1)
+            }
+        
+        except CircuitOpenError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'circuit_open': True,
+                'retry_after': e.retry_after
             }
         
         except Exception as e:
@@ -85,6 +245,126 @@ class EmailService:
                 'error': str(e)
             }
     
+    def send_batch(self, messages):
+        """
+        Send several emails in one transport call per 100 messages (Resend's batch endpoint).
+        
+        Resend accepts or rejects a batch as a whole. If it rejects one outright
+        (a non-transient error), the chunk is resent message by message so one
+        invalid message doesn't fail the others.
+        
+        Args:
+            messages: List of dicts with 'to', 'subject', 'html' and optional 'from', 'text' and 'idempotency_key'
+        
+        Returns:
+            List of dicts with 'success', 'email_id' and 'latency_ms', or 'error', in the same order as
+            messages ('sent_individually' is set on results of a batch that was resent message by message)
+        """
+        default_from = os.getenv('RESEND_FROM_EMAIL', 'onboarding@resend.dev')
+        results = []
+        
+        for start in range(0, len(messages), BATCH_LIMIT):
+            chunk = messages[start:start + BATCH_LIMIT]
+            params = []
+            for message in chunk:
+                item = {
+                    "from": message.get('from') or default_from,
+                    "to": message['to'],
+                    "subject": message['subject'],
+                    "html": message['html']
+                }
+                if message.get('text'):
+                    item["text"] = message['text']
+                params.append(item)
+            
+            try:
+                email_ids, latency_ms = self._deliver(self.transport.send_batch, params,
+                                                      idempotency_key=batch_idempotency_key(chunk))
+                
+                for email_id in email_ids:
+                    if email_id:
+                        results.append({'success': True, 'email_id': email_id, 'latency_ms': round(latency_ms, 1)})
+                    else:
+                        results.append({'success': False, 'error': 'No result returned for message'})
+            
+            except CircuitOpenError as e:
+                results.extend({'success': False, 'error': str(e), 'circuit_open': True, 'retry_after': e.retry_after}
+                               for _ in chunk)
+            
+            except Exception as e:
+                logger.error(f"Error sending email batch: {e}")
+                if is_transient_error(e) or len(chunk) == 1:
+                    results.extend({'success': False, 'error': str(e)} for _ in chunk)
+                else:
+                    # The provider rejected the whole batch (e.g. a 422 for one bad address);
+                    # send each message on its own so only the bad ones fail
+                    results.extend(dict(self.send_message(message), sent_individually=True) for message in chunk)
+        
+        return results
+    
+    def send_messages(self, messages):
+        """
+        Send messages built by the build_* methods, batching when there is more than one.
+        
+        Args:
+            messages: List of message dicts (None entries are skipped)
+        
+        Returns:
+            List of result dicts, one per non-None message
+        """
+        messages = [message for message in messages if message]
+        if len(messages) == 1:
+            return [self.send_message(messages[0])]
+        return self.send_batch(messages)
+    
+    def send_contact_emails(self, contact_message, admin_email=None, from_email=None):
+        """
+        Send the admin notification and user confirmation for a contact message in one batch.
+        
+        Args:
+            contact_message: ContactMessage object or dict
+            admin_email: Admin email address (defaults to env variable)
+            from_email: Sender email for the confirmation (defaults to env variable)
+        
+        Returns:
+            List of result dicts (notification first, then confirmation if there is an address)
+        """
+        return self.send_messages([
+            self.build_contact_notification(contact_message, admin_email=admin_email),
+            self.build_contact_confirmation(contact_message, from_email=from_email)
+        ])
+    
+    def send_investor_emails(self, investor_booking, admin_email=None, from_email=None):
+        """
+        Send the admin notification and investor confirmation for a booking in one batch.
+        
+        Args:
+            investor_booking: InvestorBooking object or dict
+            admin_email: Admin email address (defaults to env variable)
+            from_email: Sender email for the confirmation (defaults to env variable)
+        
+        Returns:
+            List of result dicts (notification first, then confirmation if there is an address)
+        """
+        return self.send_messages([
+            self.build_investor_notification(investor_booking, admin_email=admin_email),
+            self.build_investor_confirmation(investor_booking, from_email=from_email)
+        ])
+    
+    def send_message(self, message):
+        """
+        Send a message built by one of the build_* methods.
+        
+        Args:
+            message: dict with 'to', 'subject', 'html' and optional 'from', 'text' and 'idempotency_key'
+        
+        Returns:
+            dict with 'success', 'email_id' or 'error'
+        """
+        return self.send_email(message['to'], message['subject'], message['html'],
+                               from_email=message.get('from'), text_content=message.get('text'),
+                               idempotency_key=message.get('idempotency_key'))
+    
     def send_contact_notification(self, contact_message, admin_email=None):
         """
         Send notification email to admin about new contact message.
@@ -96,6 +376,19 @@ class EmailService:
         Returns:
             dict with 'success' and 'email_id' or 'error'
         """
+        return self.send_message(self.build_contact_notification(contact_message, admin_email=admin_email))
+    
+    def build_contact_notification(self, contact_message, admin_email=None):
+        """
+        Build notification email to admin about new contact message.
+        
+        Args:
+            contact_message: ContactMessage object or dict
+            admin_email: Admin email address (defaults to env variable)
+        
+        Returns:
+            Message dict with 'to', 'subject', 'html', 'text' and 'from'
+        """
         if not admin_email:
             admin_email = os.getenv('ADMIN_EMAIL', 'buxinhealth@gmail.com')
         
@@ -105,24 +398,8 @@ class EmailService:
         else:
             data = contact_message
         
-        # Create HTML email
-        html_content = f"""
-        <h2>New Contact Form Message</h2>
-        <p>You have received a new message from the contact form:</p>
-        <ul>
-            <li><strong>Full Name:</strong> {data.get('full_name', 'N/A')}</li>
-            <li><strong>Email:</strong> {data.get('email', 'N/A')}</li>
-            <li><strong>Subject:</strong> {data.get('subject', 'N/A')}</li>
-            <li><strong>Date & Time:</strong> {data.get('submitted_at', 'N/A')}</li>
-        </ul>
-        <h3>Message:</h3>
-        <p>{data.get('message', '').replace(chr(10), '<br>')}</p>
-        <p>You can view and manage this message in the admin panel.</p>
-        """
-        
-        subject = f"New Contact Form Message: {data.get('subject', 'No Subject')}"
-        
-        return self.send_email(admin_email, subject, html_content)
+        email = self.render_email('contact_notification', data=data)
+        return {'to': admin_email, 'from': None, **email}
     
     def send_contact_confirmation(self, contact_message, from_email=None):
         """
@@ -135,32 +412,38 @@ class EmailService:
         Returns:
             dict with 'success' and 'email_id' or 'error'
         """
+        message = self.build_contact_confirmation(contact_message, from_email=from_email)
+        if not message:
+            return {
+                'success': False,
+                'error': 'No email address provided'
+            }
+        return self.send_message(message)
+    
+    def build_contact_confirmation(self, contact_message, from_email=None):
+        """
+        Build confirmation email to user after contact form submission.
+        
+        Args:
+            contact_message: ContactMessage object or dict
+            from_email: Sender email (defaults to env variable)
+        
+        Returns:
+            Message dict, or None if the message has no email address
+        """
         # Extract data
         if hasattr(contact_message, 'to_dict'):
             data = contact_message.to_dict()
         else:
             data = contact_message
         
-        # Create HTML email
-        html_content = f"""
-        <h2>Thank You for Contacting Us</h2>
-        <p>Dear {data.get('full_name', 'Valued Customer')},</p>
-        <p>Thank you for contacting us. We have received your message and will get back to you soon.</p>
-        <p><strong>Your Message:</strong></p>
-        <p><em>{data.get('subject', 'No Subject')}</em></p>
-        <p>Best regards,<br>Healthcare Robot Team</p>
-        """
-        
-        subject = "We Received Your Message"
         user_email = data.get('email')
         
         if not user_email:
-            return {
-                'success': False,
-                'error': 'No email address provided'
-            }
+            return None
         
-        return self.send_email(user_email, subject, html_content, from_email=from_email)
+        email = self.render_email('contact_confirmation', data=data)
+        return {'to': user_email, 'from': from_email, **email}
     
     def send_investor_notification(self, investor_booking, admin_email=None):
         """
@@ -173,6 +456,19 @@ class EmailService:
         Returns:
             dict with 'success' and 'email_id' or 'error'
         """
+        return self.send_message(self.build_investor_notification(investor_booking, admin_email=admin_email))
+    
+    def build_investor_notification(self, investor_booking, admin_email=None):
+        """
+        Build notification email to admin about new investor meeting request.
+        
+        Args:
+            investor_booking: InvestorBooking object or dict
+            admin_email: Admin email address (defaults to env variable)
+        
+        Returns:
+            Message dict with 'to', 'subject', 'html', 'text' and 'from'
+        """
         if not admin_email:
             admin_email = os.getenv('ADMIN_EMAIL', 'buxinhealth@gmail.com')
         
@@ -182,33 +478,8 @@ class EmailService:
         else:
             data = investor_booking
         
-        # Platform display names
-        platform_names = {
-            'google_meet': 'Google Meet',
-            'zoom': 'Zoom',
-            'whatsapp': 'WhatsApp',
-            'phone': 'Direct Phone Call'
-        }
-        platform_name = platform_names.get(data.get('platform', ''), data.get('platform', 'N/A'))
-        
-        # Create HTML email
-        html_content = f"""
-        <h2>New Investor Meeting Request</h2>
-        <p>A new investor has requested a meeting:</p>
-        <ul>
-            <li><strong>Name:</strong> {data.get('full_name', 'N/A')}</li>
-            <li><strong>Email:</strong> {data.get('email', 'N/A')}</li>
-            <li><strong>Phone:</strong> {data.get('phone', 'N/A')}</li>
-            <li><strong>Country:</strong> {data.get('country', 'N/A')}</li>
-            <li><strong>Meeting Date & Time:</strong> {data.get('meeting_date', 'N/A')}</li>
-            <li><strong>Platform:</strong> {platform_name}</li>
-        </ul>
-        <p>Please review this booking in the admin panel.</p>
-        """
-        
-        subject = f"New Investor Meeting Request from {data.get('full_name', 'Investor')}"
-        
-        return self.send_email(admin_email, subject, html_content)
+        email = self.render_email('investor_notification', data=data)
+        return {'to': admin_email, 'from': None, **email}
     
     def send_investor_confirmation(self, investor_booking, from_email=None):
         """
@@ -221,53 +492,79 @@ class EmailService:
         Returns:
             dict with 'success' and 'email_id' or 'error'
         """
+        message = self.build_investor_confirmation(investor_booking, from_email=from_email)
+        if not message:
+            return {
+                'success': False,
+                'error': 'No email address provided'
+            }
+        return self.send_message(message)
+    
+    def build_investor_confirmation(self, investor_booking, from_email=None):
+        """
+        Build confirmation email to investor after meeting request submission.
+        
+        Args:
+            investor_booking: InvestorBooking object or dict
+            from_email: Sender email (defaults to env variable)
+        
+        Returns:
+            Message dict, or None if the booking has no email address
+        """
         # Extract data
         if hasattr(investor_booking, 'to_dict'):
             data = investor_booking.to_dict()
         else:
             data = investor_booking
         
-        # Platform display names
-        platform_names = {
-            'google_meet': 'Google Meet',
-            'zoom': 'Zoom',
-            'whatsapp': 'WhatsApp',
-            'phone': 'Direct Phone Call'
-        }
-        platform_name = platform_names.get(data.get('platform', ''), data.get('platform', 'N/A'))
-        
-        # Create HTML email
-        html_content = f"""
-        <h2>Meeting Request Confirmed</h2>
-        <p>Dear {data.get('full_name', 'Valued Investor')},</p>
-        <p>Thank you for your interest! We have received your meeting request.</p>
-        <h3>Your Meeting Details:</h3>
-        <ul>
-            <li><strong>Date & Time:</strong> {data.get('meeting_date', 'N/A')}</li>
-            <li><strong>Platform:</strong> {platform_name}</li>
-        </ul>
-        <p>We will review your request and get back to you shortly to confirm the meeting details.</p>
-        <p>Best regards,<br>Healthcare Robot Team</p>
-        """
-        
-        subject = "Your Meeting Request Has Been Received"
         investor_email = data.get('email')
         
         if not investor_email:
-            return {
-                'success': False,
-                'error': 'No email address provided'
-            }
+            return None
+        
+        email = self.render_email('investor_confirmation', data=data)
+        return {'to': investor_email, 'from': from_email, **email}
+    
+    def build_admin_digest(self, items, admin_email=None):
+        """
+        Build one email summarizing several buffered admin notifications.
+        
+        Args:
+            items: List of dicts with 'kind', 'html', 'text' and 'created_at' of each notification
+            admin_email: Admin email address (defaults to env variable)
+        
+        Returns:
+            Message dict with 'to', 'subject', 'html', 'text' and 'from'
+        """
+        if not admin_email:
+            admin_email = os.getenv('ADMIN_EMAIL', 'buxinhealth@gmail.com')
+        
+        investor_count = sum(1 for item in items if item.get('kind') == 'investor_notification')
+        contact_count = sum(1 for item in items if item.get('kind') == 'contact_notification')
+        
+        summary = []
+        if investor_count:
+            summary.append(f"{investor_count} investor meeting request{'s' if investor_count != 1 else ''}")
+        if contact_count:
+            summary.append(f"{contact_count} contact message{'s' if contact_count != 1 else ''}")
+        other_count = len(items) - investor_count - contact_count
+        if other_count:
+            summary.append(f"{other_count} other notification{'s' if other_count != 1 else ''}")
+        summary_text = ', '.join(summary)
         
-        return self.send_email(investor_email, subject, html_content, from_email=from_email)
+        email = self.render_email('admin_digest', items=items, summary=summary_text)
+        return {'to': admin_email, 'from': None, **email}
 
 # Global instance
 _email_service = None
+_email_service_lock = threading.Lock()
 
 def get_email_service():
-    """Get or create Email service instance."""
+    """Get or create Email service instance (shared by all threads, and so is its HTTP session)."""
     global _email_service
     if _email_service is None:
-        _email_service = EmailService()
+        with _email_service_lock:
+            if _email_service is None:
+                _email_service = EmailService()
     return _email_service
 
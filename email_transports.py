@@ -0,0 +1,336 @@
+"""Delivery transports for EmailService: Resend API, a local directory, or an SMTP server."""
+import os
+import uuid
+import smtplib
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+import requests
+import resend
+from requests.adapters import HTTPAdapter
+from resend.exceptions import ResendError, raise_for_code_and_type
+from resend.version import get_version
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a transport while its circuit breaker is open."""
+
+    def __init__(self, retry_after):
+        """
+        Args:
+            retry_after: Seconds until the breaker lets a trial call through
+        """
+        super().__init__(f"Email transport unavailable, retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def is_transient_error(error):
+    """
+    Check whether a send failure says the transport is unhealthy, rather than the message being bad.
+
+    Network errors, timeouts, rate limiting and 5xx responses count; validation
+    errors (e.g. an unverified sender domain) do not trip the breaker.
+    """
+    if isinstance(error, (requests.RequestException, smtplib.SMTPServerDisconnected,
+                          smtplib.SMTPConnectError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, ResendError):
+        code = str(error.code)
+        return code == '429' or code.startswith('5')
+    return False
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker for an email transport.
+
+    Closed: calls go through. After failure_threshold consecutive transient
+    failures it opens and calls fail fast with CircuitOpenError. After
+    reset_timeout seconds it is half-open: one trial call is let through, which
+    closes the breaker on success or re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker (defaults to EMAIL_BREAKER_THRESHOLD or 5)
+            reset_timeout: Seconds the breaker stays open (defaults to EMAIL_BREAKER_RESET_TIMEOUT or 30)
+        """
+        self.failure_threshold = failure_threshold or int(os.getenv('EMAIL_BREAKER_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('EMAIL_BREAKER_RESET_TIMEOUT', '30'))
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until an open breaker allows a trial call (0 if calls are allowed now)."""
+        with self._lock:
+            if self.state != 'open':
+                return 0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """
+        Reserve a call, or fail fast.
+
+        Raises:
+            CircuitOpenError if the breaker is open, or half-open with a trial already running
+        """
+        with self._lock:
+            if self.state == 'open':
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(1)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        """Close the breaker after a healthy call."""
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a transient failure, opening the breaker at the threshold or after a failed trial."""
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    logger.warning(f"Email circuit breaker opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self):
+        """Get breaker state and counters."""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'retry_after': round(self.retry_after(), 1),
+            'times_opened': self.times_opened,
+            'rejected': self.rejected
+        }
+
+class EmailTransport(ABC):
+    """
+    Base class for transports.
+
+    Payloads are dicts with 'from', 'to', 'subject', 'html' and optional 'text'.
+    Both methods raise on failure; EmailService turns exceptions into result dicts.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def send(self, payload, idempotency_key=None):
+        """
+        Deliver one email.
+
+        Returns:
+            Provider message ID
+        """
+
+    def send_batch(self, payloads, idempotency_key=None):
+        """
+        Deliver several emails.
+
+        Returns:
+            List of provider message IDs (None where one wasn't returned), in payload order
+        """
+        return [self.send(payload) for payload in payloads]
+
+def create_http_session(pool_size=None):
+    """
+    Create a keep-alive HTTP session for the Resend API.
+
+    requests.Session is safe to share between threads; its connection pool
+    keeps up to pool_size TLS connections open for reuse.
+
+    Args:
+        pool_size: Connections kept per host (defaults to RESEND_POOL_SIZE or 10)
+    """
+    pool_size = pool_size or int(os.getenv('RESEND_POOL_SIZE', '10'))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        "Accept": "application/json",
+        "User-Agent": f"resend-python:{get_version()}"
+    })
+    return session
+
+class ResendTransport(EmailTransport):
+    """Resend API over a pooled keep-alive session with connect/read timeouts."""
+
+    name = 'resend'
+
+    def __init__(self, api_key=None, connect_timeout=None, read_timeout=None):
+        """
+        Args:
+            api_key: Resend API key (defaults to RESEND_API_KEY)
+            connect_timeout: Seconds to establish a connection (defaults to RESEND_CONNECT_TIMEOUT or 5)
+            read_timeout: Seconds to wait for a response (defaults to RESEND_READ_TIMEOUT or 20)
+        """
+        api_key = api_key or os.getenv('RESEND_API_KEY')
+        if not api_key:
+            raise ValueError("RESEND_API_KEY environment variable is not set")
+
+        resend.api_key = api_key
+
+        # One pooled keep-alive session shared by every thread, instead of the SDK's
+        # per-call requests.request() (new TLS handshake each time, no timeout)
+        self.api_key = api_key
+        self.timeout = (
+            connect_timeout or float(os.getenv('RESEND_CONNECT_TIMEOUT', '5')),
+            read_timeout or float(os.getenv('RESEND_READ_TIMEOUT', '20'))
+        )
+        self.session = create_http_session()
+
+    def post(self, path, payload, idempotency_key=None):
+        """
+        POST to the Resend API over the pooled session.
+
+        Args:
+            path: API path, e.g. '/emails'
+            payload: JSON body
+            idempotency_key: Sent as Idempotency-Key so a retried request isn't delivered twice
+
+        Returns:
+            Decoded JSON response
+
+        Raises:
+            ResendError for API errors, requests.RequestException for network errors and timeouts
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+
+        response = self.session.post(f"{resend.api_url}{path}", json=payload, headers=headers, timeout=self.timeout)
+        body = response.json() if response.content else {}
+        if response.status_code >= 400:
+            if isinstance(body, dict) and body.get('statusCode'):
+                raise_for_code_and_type(code=body.get('statusCode'), message=body.get('message'),
+                                        error_type=body.get('name'))
+            raise ResendError(code=response.status_code, error_type='http_error',
+                              message=f"HTTP {response.status_code}", suggested_action='')
+        return body
+
+    def send(self, payload, idempotency_key=None):
+        return self.post('/emails', payload, idempotency_key=idempotency_key).get('id')
+
+    def send_batch(self, payloads, idempotency_key=None):
+        # Resend returns {'data': [{'id': ...}, ...]} in request order
+        result = self.post('/emails/batch', payloads, idempotency_key=idempotency_key)
+        data = result.get('data', []) if isinstance(result, dict) else []
+        return [data[i].get('id') if i < len(data) and isinstance(data[i], dict) else None
+                for i in range(len(payloads))]
+
+    def stats(self):
+        """Get the configured timeouts."""
+        return {'connect_timeout': self.timeout[0], 'read_timeout': self.timeout[1]}
+
+def build_mime_message(payload, message_id=None):
+    """Build a multipart MIME email (plain text + HTML) from a payload."""
+    message = EmailMessage()
+    message['From'] = payload['from']
+    message['To'] = payload['to'] if isinstance(payload['to'], str) else ', '.join(payload['to'])
+    message['Subject'] = payload['subject']
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = message_id or make_msgid()
+    message.set_content(payload.get('text') or 'This email requires an HTML-capable client.')
+    message.add_alternative(payload['html'], subtype='html')
+    return message
+
+class FileTransport(EmailTransport):
+    """Write each email to a directory as an .eml file instead of sending it."""
+
+    name = 'file'
+
+    def __init__(self, directory=None):
+        """
+        Args:
+            directory: Output directory (defaults to EMAIL_FILE_DIR or data/emails)
+        """
+        self.directory = directory or os.getenv('EMAIL_FILE_DIR', os.path.join('data', 'emails'))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def send(self, payload, idempotency_key=None):
+        email_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{email_id}.eml")
+        with open(path, 'wb') as f:
+            f.write(build_mime_message(payload).as_bytes())
+        return email_id
+
+    def stats(self):
+        return {'directory': self.directory}
+
+class SMTPTransport(EmailTransport):
+    """
+    Send through an SMTP server, e.g. a local debug server for load tests:
+
+        python -m aiosmtpd -n -l localhost:1025
+    """
+
+    name = 'smtp'
+
+    def __init__(self, host=None, port=None, timeout=None):
+        """
+        Args:
+            host: SMTP host (defaults to EMAIL_SMTP_HOST or localhost)
+            port: SMTP port (defaults to EMAIL_SMTP_PORT or 1025)
+            timeout: Socket timeout in seconds (defaults to RESEND_READ_TIMEOUT or 20)
+        """
+        self.host = host or os.getenv('EMAIL_SMTP_HOST', 'localhost')
+        self.port = port or int(os.getenv('EMAIL_SMTP_PORT', '1025'))
+        self.timeout = timeout or float(os.getenv('RESEND_READ_TIMEOUT', '20'))
+
+    def send(self, payload, idempotency_key=None):
+        return self.send_batch([payload])[0]
+
+    def send_batch(self, payloads, idempotency_key=None):
+        # One connection per call; smtplib connections aren't thread-safe
+        email_ids = []
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for payload in payloads:
+                message_id = make_msgid()
+                smtp.send_message(build_mime_message(payload, message_id=message_id))
+                email_ids.append(message_id.strip('<>'))
+        return email_ids
+
+    def stats(self):
+        return {'host': self.host, 'port': self.port}
+
+TRANSPORTS = {
+    'resend': ResendTransport,
+    'file': FileTransport,
+    'smtp': SMTPTransport
+}
+
+def create_transport(name=None):
+    """
+    Create the transport selected by EMAIL_TRANSPORT.
+
+    Args:
+        name: 'resend' (default), 'file' or 'smtp'
+
+    Returns:
+        EmailTransport instance
+    """
+    name = (name or os.getenv('EMAIL_TRANSPORT', 'resend')).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown EMAIL_TRANSPORT '{name}' (expected one of {', '.join(TRANSPORTS)})")
+    return TRANSPORTS[name]()
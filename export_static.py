@@ -0,0 +1,128 @@
+"""Export script to pre-render the public pages into a static directory.
+
+The output can be served straight from disk or a CDN, or by the app itself
+with STATIC_EXPORT_DIR pointing at it. Only /contact, /api/investor-booking
+and /admin then need the Flask app.
+
+Usage:
+    python export_static.py [--output static_export]
+"""
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+from flask import url_for
+from app import app, STATIC_EXPORT_PAGES
+
+def file_hash(filepath):
+    """Get a short content hash for a file."""
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:12]
+
+def export_assets(output_dir):
+    """
+    Copy static assets into the export with content-hashed filenames.
+
+    Legacy media under static/uploads is left out; it is still served by the app.
+
+    Returns:
+        dict mapping original asset URLs to hashed asset URLs
+    """
+    print("Exporting static assets...")
+    static_folder = app.static_folder
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+
+    assets = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root).startswith(upload_folder):
+            continue
+        for filename in files:
+            source = os.path.join(root, filename)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            name, ext = os.path.splitext(relative)
+            hashed = f"{name}.{file_hash(source)}{ext}"
+
+            destination = os.path.join(output_dir, 'static', hashed)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(source, destination)
+
+            assets[f"/static/{relative}"] = f"/static/{hashed}"
+
+    print(f"Exported {len(assets)} assets")
+    return assets
+
+def rewrite_asset_urls(body, assets):
+    """Point asset references in a rendered page at their hashed names."""
+    # Longest first so /static/a.css.map isn't clobbered by /static/a.css
+    for original in sorted(assets, key=len, reverse=True):
+        body = body.replace(original, assets[original])
+    return body
+
+def export_pages(output_dir, assets):
+    """Render every public page with the live templates, PageData and SiteSettings."""
+    print("Rendering public pages...")
+
+    with app.test_request_context():
+        urls = {endpoint: url_for(endpoint) for endpoint in STATIC_EXPORT_PAGES}
+
+    exported = 0
+    with app.test_client() as client:
+        for endpoint, path in STATIC_EXPORT_PAGES.items():
+            url = urls[endpoint]
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"Rendering {url} failed with status {response.status_code}")
+
+            body = response.get_data(as_text=True)
+            if path.endswith('.html'):
+                body = rewrite_asset_urls(body, assets)
+
+            destination = os.path.join(output_dir, path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(destination, 'w', encoding='utf-8') as f:
+                f.write(body)
+
+            print(f"  {url} -> {path}")
+            exported += 1
+
+    print(f"Rendered {exported} pages")
+
+def run_export(output_dir):
+    """Run a full export, replacing the previous one only once it succeeds."""
+    print(f"Starting static export to {output_dir}...")
+
+    # Never render from an existing export
+    app.config['STATIC_EXPORT_DIR'] = None
+
+    build_dir = f"{output_dir.rstrip(os.sep)}.tmp"
+    if os.path.exists(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+
+    assets = export_assets(build_dir)
+    export_pages(build_dir, assets)
+
+    with open(os.path.join(build_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_at': datetime.utcnow().isoformat(),
+            'pages': STATIC_EXPORT_PAGES,
+            'assets': assets
+        }, f, indent=2)
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.rename(build_dir, output_dir)
+
+    print("\nExport completed!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render public pages to a static directory.')
+    parser.add_argument('--output', default=os.getenv('STATIC_EXPORT_DIR') or 'static_export',
+                        help='Output directory (default: $STATIC_EXPORT_DIR or static_export)')
+    args = parser.parse_args()
+    run_export(args.output)
@@ -0,0 +1,140 @@
+"""Garbage collection for Cloudinary assets that no content references any more.
+
+Every UploadedFile whose URL (or public ID) no longer appears in PageData,
+site settings or an email campaign, and that was neither uploaded nor reused
+(a deduplicated upload or a media library pick) within the grace period,
+is deleted from its storage backend (Cloudinary or local) in batches and then
+removed from uploaded_files.
+The grace period protects files uploaded or picked in the admin but not saved yet.
+
+Runs as a dry run (report only) unless --delete is given.
+
+Usage:
+    python media_gc.py [--grace-days 7] [--delete]
+"""
+import os
+import re
+import json
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from app import app
+from models import db, PageData, SiteSettings, EmailCampaign, UploadedFile
+from database import init_db
+from storage import get_storage, get_storage_for_url
+
+DELIVERY_RESOURCE_TYPE = re.compile(r'/(image|video|raw)/upload/')
+
+def collect_referenced_text():
+    """
+    Get every stored text that can reference an uploaded file, joined into one string.
+
+    Covers PageData content, site settings (e.g. the logo) and campaign HTML,
+    since emails already sent still load their images from Cloudinary.
+    """
+    parts = [json.dumps(page.content, ensure_ascii=False) for page in PageData.query.all()]
+    parts += [setting.value or '' for setting in SiteSettings.query.all()]
+    parts += [html for (html,) in db.session.query(EmailCampaign.html_content).all()]
+    return '\n'.join(parts)
+
+def is_referenced(uploaded_file, text):
+    """Check whether a file's URL or public ID (matching transformed URLs too) appears in the content."""
+    return (uploaded_file.cloudinary_url in text
+            or f"/{uploaded_file.cloudinary_public_id}" in text)
+
+def delivery_resource_type(uploaded_file):
+    """Get the Cloudinary resource type of an uploaded file."""
+    match = DELIVERY_RESOURCE_TYPE.search(uploaded_file.cloudinary_url or '')
+    if match:
+        return match.group(1)
+    return get_storage().get_resource_type(uploaded_file.original_filename)
+
+def find_garbage(grace_days):
+    """
+    Get the uploaded files that no content references and that are past the grace period.
+
+    The grace period runs from the later of uploaded_at and last_used_at.
+
+    Returns:
+        List of UploadedFile rows, oldest first
+    """
+    cutoff = datetime.utcnow() - timedelta(days=grace_days)
+    text = collect_referenced_text()
+    candidates = UploadedFile.query.filter(
+        UploadedFile.uploaded_at < cutoff,
+        or_(UploadedFile.last_used_at.is_(None), UploadedFile.last_used_at < cutoff)
+    ).order_by(UploadedFile.uploaded_at).all()
+    return [uploaded_file for uploaded_file in candidates if not is_referenced(uploaded_file, text)]
+
+def print_report(garbage):
+    """Print the unreferenced files and the storage they use."""
+    total_size = 0
+    for uploaded_file in garbage:
+        total_size += uploaded_file.file_size or 0
+        print(f"  {uploaded_file.uploaded_at:%Y-%m-%d}  {uploaded_file.file_size or 0:>12,}  "
+              f"{delivery_resource_type(uploaded_file):<5}  {uploaded_file.cloudinary_public_id}")
+    print(f"{len(garbage)} unreferenced files, {total_size / (1024 * 1024):.1f} MB")
+
+def delete_garbage(garbage, batch_size=100):
+    """
+    Delete unreferenced files from their storage backend in batches, then their UploadedFile rows.
+
+    Rows are only removed for assets the backend confirmed are gone, so a
+    failed batch is retried on the next run. Files whose URL belongs to no
+    known backend are skipped.
+
+    Returns:
+        Tuple of (deleted count, failed count)
+    """
+    groups = {}
+    for uploaded_file in garbage:
+        storage = get_storage_for_url(uploaded_file.cloudinary_url)
+        if storage is None:
+            print(f"  Skipped: {uploaded_file.cloudinary_url} (not in a known storage backend)")
+            continue
+        groups.setdefault((storage.name, delivery_resource_type(uploaded_file)), []).append(uploaded_file)
+
+    deleted = 0
+    failed = 0
+    for (storage_name, resource_type), files in groups.items():
+        result = get_storage(storage_name).delete_many(
+            [uploaded_file.cloudinary_public_id for uploaded_file in files],
+            resource_type=resource_type
+        )
+        for public_id, error in result['failed'].items():
+            print(f"  Failed: {public_id}: {error}")
+        failed += len(result['failed'])
+
+        gone = set(result['deleted'])
+        ids = [uploaded_file.id for uploaded_file in files if uploaded_file.cloudinary_public_id in gone]
+        for start in range(0, len(ids), batch_size):
+            UploadedFile.query.filter(UploadedFile.id.in_(ids[start:start + batch_size])).delete(synchronize_session=False)
+            db.session.commit()
+        deleted += len(ids)
+
+    return deleted, failed
+
+def run_gc(grace_days=7, delete=False):
+    """Run media garbage collection."""
+    print(f"Scanning for media unreferenced for over {grace_days} days...")
+
+    with app.app_context():
+        init_db(app)
+
+        garbage = find_garbage(grace_days)
+        print_report(garbage)
+
+        if not delete:
+            print("\nDry run: nothing deleted (pass --delete to delete these files)")
+            return
+
+        deleted, failed = delete_garbage(garbage)
+        print(f"\nDeleted {deleted} files" + (f", {failed} failed (run again to retry)" if failed else ""))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Delete Cloudinary media that no content references.')
+    parser.add_argument('--grace-days', type=float, default=float(os.getenv('MEDIA_GC_GRACE_DAYS', '7')),
+                        help='Only collect files uploaded or reused more than this many days ago (default: $MEDIA_GC_GRACE_DAYS or 7)')
+    parser.add_argument('--delete', action='store_true', help='Delete the files (default is a dry-run report)')
+    args = parser.parse_args()
+    run_gc(grace_days=args.grace_days, delete=args.delete)
@@ -5,6 +5,7 @@ from datetime import datetime
 from app import app
 from models import db, ContactMessage, InvestorBooking, PageData, SiteSettings, ContactInfo
 from database import init_db
+from migrations import run_migrations, migration_status
 
 def load_json_file(filepath):
     """Load JSON file, return empty list/dict if not found."""
@@ -189,6 +190,12 @@ def run_migration():
         # Initialize database
         init_db(app)
         
+        # Apply schema migrations (a no-op if init_db already did)
+        if db.engine.dialect.name == 'postgresql':
+            run_migrations()
+            for migration, applied in migration_status():
+                print(f"  Schema migration {migration.version:>3} {'applied' if applied else 'PENDING'}: {migration.name}")
+        
         # Run migrations
         migrate_contact_messages()
         migrate_investor_bookings()
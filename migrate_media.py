@@ -0,0 +1,230 @@
+"""Migration script to move legacy /static/uploads media to Cloudinary.
+
+Every /static/uploads/... URL referenced by PageData (and site settings such
+as the logo) is uploaded to Cloudinary through a thread pool, recorded as an
+UploadedFile and then rewritten to its Cloudinary URL in a single transaction.
+
+Re-running is safe: files already recorded (matched by SHA-256 content hash)
+are not uploaded again, public IDs are derived from the content hash so an
+upload interrupted before it was recorded is picked up instead of duplicated,
+and URLs that were already rewritten no longer match.
+
+Usage:
+    python migrate_media.py [--workers 4] [--dry-run]
+"""
+import os
+import re
+import argparse
+from datetime import datetime
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app import app, record_uploaded_file
+from models import db, PageData, SiteSettings, UploadedFile
+from database import init_db
+from cloudinary_service import get_cloudinary_service, file_sha256
+from cache_service import get_content_cache, publish_invalidation
+
+MIGRATION_FOLDER = 'uploads/migrated'
+
+# Relative or absolute (any host) URLs of files under static/uploads
+LOCAL_UPLOAD_URL = re.compile(r'''(?:https?://[^/\s"'<>]+)?/static/uploads/([^\s"'<>?#)]+)''')
+
+def find_local_urls(value, found=None):
+    """
+    Collect the static/uploads filenames referenced anywhere in a JSON value.
+
+    Returns:
+        Set of filenames (URL-decoded, relative to the upload folder)
+    """
+    found = set() if found is None else found
+    if isinstance(value, str):
+        found.update(unquote(name) for name in LOCAL_UPLOAD_URL.findall(value))
+    elif isinstance(value, dict):
+        for item in value.values():
+            find_local_urls(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            find_local_urls(item, found)
+    return found
+
+def rewrite_local_urls(value, url_map):
+    """
+    Replace migrated static/uploads URLs in a JSON value.
+
+    Args:
+        value: JSON value (str, dict, list or scalar)
+        url_map: Filename -> Cloudinary URL; other URLs are left untouched
+
+    Returns:
+        The rewritten value (a new object; the input is not modified)
+    """
+    if isinstance(value, str):
+        return LOCAL_UPLOAD_URL.sub(lambda m: url_map.get(unquote(m.group(1)), m.group(0)), value)
+    if isinstance(value, dict):
+        return {key: rewrite_local_urls(item, url_map) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rewrite_local_urls(item, url_map) for item in value]
+    return value
+
+def collect_references():
+    """Get the filenames referenced by PageData content and site settings."""
+    filenames = set()
+    for page in PageData.query.all():
+        find_local_urls(page.content, filenames)
+    for setting in SiteSettings.query.all():
+        find_local_urls(setting.value, filenames)
+    return filenames
+
+def hash_local_file(path):
+    """Get (size, SHA-256) of a local file."""
+    return os.path.getsize(path), file_sha256(path)
+
+def upload_local_file(path, filename, content_hash):
+    """
+    Upload one local file under a public ID derived from its content hash.
+
+    Returns:
+        Upload result dict from CloudinaryService
+    """
+    cloudinary_service = get_cloudinary_service()
+    resource_type = cloudinary_service.get_resource_type(filename)
+    public_id = cloudinary_service.new_public_id(filename, resource_type, suffix=content_hash[:12])
+    # overwrite=False: if an earlier run uploaded this public ID, Cloudinary returns the existing asset
+    return cloudinary_service.upload_file(
+        path,
+        folder=MIGRATION_FOLDER,
+        resource_type=resource_type,
+        public_id=public_id,
+        overwrite=False,
+        unique_filename=False
+    )
+
+def migrate_files(filenames, workers=4, dry_run=False):
+    """
+    Upload referenced local files that aren't on Cloudinary yet.
+
+    Hashing and uploads run on a thread pool; UploadedFile rows are written
+    from this thread as each upload finishes, so an interrupted run resumes
+    where it stopped.
+
+    Returns:
+        dict mapping filenames to Cloudinary URLs (migrated now or before)
+    """
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    paths = {}
+    for filename in sorted(filenames):
+        path = os.path.abspath(os.path.join(upload_folder, filename))
+        if not path.startswith(upload_folder + os.sep) or not os.path.isfile(path):
+            print(f"  Missing: {filename} (left unchanged)")
+            continue
+        paths[filename] = path
+
+    url_map = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Hash everything, then match hashes against files recorded earlier in one query
+        hashes = dict(zip(paths, pool.map(hash_local_file, paths.values())))
+        existing = {}
+        if hashes:
+            rows = UploadedFile.query.filter(
+                UploadedFile.content_hash.in_([content_hash for size, content_hash in hashes.values()])
+            ).all()
+            existing = {row.content_hash: row.cloudinary_url for row in rows}
+
+        pending = {}
+        for filename, (size, content_hash) in hashes.items():
+            if content_hash in existing:
+                url_map[filename] = existing[content_hash]
+                print(f"  Already migrated: {filename}")
+            elif dry_run:
+                print(f"  Would upload: {filename} ({size} bytes)")
+            else:
+                future = pool.submit(upload_local_file, paths[filename], filename, content_hash)
+                pending[future] = filename
+
+        failed = 0
+        for future in as_completed(pending):
+            filename = pending[future]
+            size, content_hash = hashes[filename]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if not result.get('success'):
+                failed += 1
+                print(f"  Failed: {filename}: {result.get('error')}")
+                continue
+
+            url_map[filename] = record_uploaded_file(
+                filename, result['url'], result['public_id'],
+                file_size=size, content_hash=content_hash
+            )
+            print(f"  Uploaded: {filename} -> {url_map[filename]}")
+
+    if failed:
+        print(f"{failed} uploads failed; run again to retry them")
+    return url_map
+
+def rewrite_references(url_map):
+    """
+    Point every PageData and site setting at the migrated URLs, in one transaction.
+
+    Returns:
+        Number of rows changed
+    """
+    changed_keys = []
+    try:
+        for page in PageData.query.with_for_update().all():
+            content = rewrite_local_urls(page.content, url_map)
+            if content != page.content:
+                page.content = content
+                page.updated_at = datetime.utcnow()
+                changed_keys.append(f'page:{page.page_name}')
+
+        settings_changed = False
+        for setting in SiteSettings.query.with_for_update().all():
+            value = rewrite_local_urls(setting.value, url_map)
+            if value != setting.value:
+                setting.value = value
+                setting.updated_at = datetime.utcnow()
+                settings_changed = True
+        if settings_changed:
+            changed_keys.append('site_settings')
+
+        if changed_keys:
+            publish_invalidation(*changed_keys)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if changed_keys:
+        get_content_cache().invalidate(*changed_keys)
+    return len(changed_keys)
+
+def run_migration(workers=4, dry_run=False):
+    """Run the media migration."""
+    print("Starting media migration to Cloudinary...")
+
+    with app.app_context():
+        init_db(app)
+
+        filenames = collect_references()
+        print(f"Found {len(filenames)} local files referenced")
+
+        url_map = migrate_files(filenames, workers=workers, dry_run=dry_run)
+
+        if dry_run:
+            print(f"\nDry run: {len(url_map)} references would be rewritten")
+            return
+
+        changed = rewrite_references(url_map)
+        print(f"Rewrote URLs in {changed} content entries")
+        print("\nMedia migration completed!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upload legacy /static/uploads media to Cloudinary and rewrite its URLs.')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('MEDIA_MIGRATION_WORKERS', '4')),
+                        help='Concurrent uploads (default: $MEDIA_MIGRATION_WORKERS or 4)')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would be migrated without uploading')
+    args = parser.parse_args()
+    run_migration(workers=args.workers, dry_run=args.dry_run)
@@ -0,0 +1,238 @@
+"""Versioned schema migrations for PostgreSQL.
+
+db.create_all() only creates missing tables. Changes to existing tables are
+listed in MIGRATIONS, applied in version order and recorded in the
+schema_migrations table, so each runs once per database.
+
+Migrations are written so the site stays up while they run:
+
+- Indexes are built with CREATE INDEX CONCURRENTLY, which doesn't block
+  writes. It can't run inside a transaction, so such migrations set
+  transactional=False and every statement must be idempotent (IF NOT EXISTS).
+  A failed concurrent build leaves an INVALID index behind; it is dropped and
+  rebuilt on the next run.
+- Transactional migrations (column changes) run with a short lock_timeout:
+  if another transaction holds the table, the ALTER fails fast instead of
+  queueing every request behind it, and the next run retries it.
+- Add columns as nullable (or with a constant default) and backfill in a
+  later migration, rather than rewriting the table in one step.
+
+Migrations run from migrate.py, which the Render build runs before deploy,
+and from init_db at app startup when AUTO_MIGRATE=true. An advisory lock
+makes sure only one process applies them; init_db only waits
+AUTO_MIGRATE_LOCK_WAIT seconds for it, so workers don't hang on import.
+"""
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from database import get_direct_database_url
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key held while migrating ("hlth" in ASCII)
+MIGRATION_LOCK_ID = 0x686c7468
+# How long a transactional migration waits for a table lock before giving up
+MIGRATION_LOCK_TIMEOUT = os.getenv('MIGRATION_LOCK_TIMEOUT', '5s')
+
+CONCURRENT_INDEX = re.compile(r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE)
+
+class Migration:
+    """One schema change: a version, a name and the SQL statements that apply it."""
+
+    def __init__(self, version, name, statements, transactional=True):
+        """
+        Args:
+            version: Unique, increasing integer
+            name: Short description, recorded in schema_migrations
+            statements: SQL statements, run in order
+            transactional: False for statements that can't run in a transaction
+                (CREATE INDEX CONCURRENTLY); they must then be idempotent
+        """
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.transactional = transactional
+
+MIGRATIONS = [
+    # Changes made before versioned migrations existed (formerly SCHEMA_UPDATES).
+    # All idempotent, so databases that already have them just record them.
+    Migration(1, 'email outbox plain-text bodies', [
+        "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS text_content TEXT",
+    ]),
+    Migration(2, 'uploaded file content hashes', [
+        "ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    ]),
+    Migration(3, 'unique uploaded file content hash index', [
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_uploaded_files_content_hash ON uploaded_files (content_hash)",
+    ], transactional=False),
+    Migration(4, 'video posters and streaming URLs', [
+        "ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS poster_url TEXT",
+        "ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS streaming_url TEXT",
+    ]),
+    Migration(5, 'media library indexes', [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_uploaded_files_uploaded_at_id ON uploaded_files (uploaded_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_uploaded_files_file_type_uploaded_at_id "
+        "ON uploaded_files (file_type, uploaded_at, id)",
+        # Trigram index so the filename search (ILIKE '%term%') doesn't scan the table
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_uploaded_files_filename_trgm "
+        "ON uploaded_files USING gin (original_filename gin_trgm_ops)",
+    ], transactional=False),
+
+    # Admin lists are ordered by submitted_at (with id as tie-breaker for keyset
+    # pagination), campaign segments and list filters select by status, and
+    # migrate.py looks up existing rows by email
+    Migration(6, 'contact message indexes', [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contact_messages_submitted_at_id "
+        "ON contact_messages (submitted_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contact_messages_status_submitted_at_id "
+        "ON contact_messages (status, submitted_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contact_messages_email_submitted_at "
+        "ON contact_messages (email, submitted_at)",
+    ], transactional=False),
+    Migration(7, 'investor booking indexes', [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_investor_bookings_submitted_at_id "
+        "ON investor_bookings (submitted_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_investor_bookings_status_submitted_at_id "
+        "ON investor_bookings (status, submitted_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_investor_bookings_email_submitted_at "
+        "ON investor_bookings (email, submitted_at)",
+    ], transactional=False),
+    # Country filter on the admin investors list
+    Migration(8, 'investor booking country index', [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_investor_bookings_country_submitted_at_id "
+        "ON investor_bookings (country, submitted_at, id)",
+    ], transactional=False),
+    # Outbox rows remember their batch so a retry resends the same batch under the same idempotency key
+    Migration(9, 'email outbox batch keys', [
+        "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS batch_key VARCHAR(40)",
+    ]),
+    # Reusing a file restarts media_gc's grace period, so a just-picked file isn't collected before it's saved
+    Migration(10, 'uploaded file last use', [
+        "ALTER TABLE uploaded_files ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMP",
+    ]),
+]
+
+def create_migration_engine(database_url=None):
+    """
+    Create an engine for running migrations.
+
+    Connects directly (not through Neon's transaction-mode pooler), since the
+    advisory lock and CREATE INDEX CONCURRENTLY need a real session.
+    """
+    url = get_direct_database_url(database_url).replace('postgresql://', 'postgresql+psycopg://', 1)
+    return create_engine(url, poolclass=NullPool, connect_args={'connect_timeout': 10, 'sslmode': 'require'})
+
+def applied_versions(conn):
+    """Get the versions recorded in schema_migrations."""
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def _drop_invalid_index(conn, name):
+    """Drop an index left INVALID by an interrupted CREATE INDEX CONCURRENTLY, so it can be rebuilt."""
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {'name': name}).first()
+    if invalid:
+        logger.warning(f"Rebuilding invalid index {name}")
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+def apply_migration(engine, migration):
+    """Apply one migration and record it."""
+    record = text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)")
+    params = {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()}
+
+    if migration.transactional:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{MIGRATION_LOCK_TIMEOUT}'"))
+            for statement in migration.statements:
+                conn.execute(text(statement))
+            conn.execute(record, params)
+        return
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text("SET statement_timeout = 0"))  # Index builds can take a while
+        for statement in migration.statements:
+            match = CONCURRENT_INDEX.match(statement.strip())
+            if match:
+                _drop_invalid_index(conn, match.group(1))
+            conn.execute(text(statement))
+        conn.execute(record, params)
+
+def run_migrations(database_url=None, lock_wait=600):
+    """
+    Apply pending migrations.
+
+    Only one process migrates at a time; others wait for it (polling, so a
+    waiting process never holds a snapshot that a concurrent index build
+    would have to wait for) and then find nothing left to do.
+
+    Args:
+        database_url: Database URL (defaults to DATABASE_URL)
+        lock_wait: Seconds to wait for another process's migration run
+
+    Returns:
+        List of applied Migration objects
+    """
+    engine = create_migration_engine(database_url)
+    applied = []
+    try:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as lock_conn:
+            deadline = time.monotonic() + lock_wait
+            while not lock_conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {'id': MIGRATION_LOCK_ID}).scalar():
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for another process to finish migrating")
+                time.sleep(1)
+
+            try:
+                lock_conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+                ))
+                done = applied_versions(lock_conn)
+                for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                    if migration.version in done:
+                        continue
+                    logger.info(f"Applying migration {migration.version}: {migration.name}")
+                    apply_migration(engine, migration)
+                    applied.append(migration)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MIGRATION_LOCK_ID})
+    finally:
+        engine.dispose()
+
+    if applied:
+        logger.info(f"Applied {len(applied)} schema migrations")
+    return applied
+
+def migration_status(database_url=None):
+    """
+    Get every migration with whether it has been applied.
+
+    Returns:
+        List of (Migration, applied) tuples in version order
+    """
+    engine = create_migration_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            exists = conn.execute(text("SELECT to_regclass('schema_migrations')")).scalar()
+            done = applied_versions(conn) if exists else set()
+    finally:
+        engine.dispose()
+    return [(migration, migration.version in done) for migration in sorted(MIGRATIONS, key=lambda m: m.version)]
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations.')
+    parser.add_argument('--status', action='store_true', help='List migrations and whether they are applied, without applying')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not args.status:
+        applied = run_migrations()
+        print(f"Applied {len(applied)} migrations")
+    for migration, applied in migration_status():
+        print(f"  {migration.version:>3}  {'applied' if applied else 'pending':<8}  {migration.name}")
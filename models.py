@@ -9,6 +9,13 @@ db = SQLAlchemy()
 class ContactMessage(db.Model):
     """Model for contact form messages."""
     __tablename__ = 'contact_messages'
+    # Mirrors migration 6 (see migrations.py): admin list order and status filters
+    # (keyset pagination on submitted_at, id) and lookups by email
+    __table_args__ = (
+        db.Index('ix_contact_messages_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_contact_messages_status_submitted_at_id', 'status', 'submitted_at', 'id'),
+        db.Index('ix_contact_messages_email_submitted_at', 'email', 'submitted_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
@@ -36,6 +43,13 @@ class ContactMessage(db.Model):
 class InvestorBooking(db.Model):
     """Model for investor meeting bookings."""
     __tablename__ = 'investor_bookings'
+    # Mirrors migrations 7 and 8 (see migrations.py)
+    __table_args__ = (
+        db.Index('ix_investor_bookings_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_investor_bookings_status_submitted_at_id', 'status', 'submitted_at', 'id'),
+        db.Index('ix_investor_bookings_email_submitted_at', 'email', 'submitted_at'),
+        db.Index('ix_investor_bookings_country_submitted_at_id', 'country', 'submitted_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
@@ -128,6 +142,12 @@ class ContactInfo(db.Model):
 class UploadedFile(db.Model):
     """Model for tracking uploaded files in Cloudinary."""
     __tablename__ = 'uploaded_files'
+    __table_args__ = (
+        db.Index('ix_uploaded_files_content_hash', 'content_hash', unique=True),
+        # Media library: newest first, optionally by type (keyset pagination on uploaded_at, id)
+        db.Index('ix_uploaded_files_uploaded_at_id', 'uploaded_at', 'id'),
+        db.Index('ix_uploaded_files_file_type_uploaded_at_id', 'file_type', 'uploaded_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     original_filename = db.Column(db.String(255), nullable=False)
@@ -135,7 +155,11 @@ class UploadedFile(db.Model):
     cloudinary_public_id = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)  # image, video, pdf, other
     file_size = db.Column(db.Integer, nullable=True)  # Size in bytes
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the file, for deduplication
+    poster_url = db.Column(Text, nullable=True)  # Videos: poster frame
+    streaming_url = db.Column(Text, nullable=True)  # Videos: HLS adaptive-streaming playlist
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime, nullable=True)  # Last reused (deduplicated upload or library pick)
     
     def to_dict(self):
         return {
@@ -145,6 +169,124 @@ class UploadedFile(db.Model):
             'cloudinary_public_id': self.cloudinary_public_id,
             'file_type': self.file_type,
             'file_size': self.file_size,
-            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
+            'content_hash': self.content_hash,
+            'poster_url': self.poster_url,
+            'streaming_url': self.streaming_url,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None
         }
 
+
+class EmailOutbox(db.Model):
+    """Model for outgoing emails waiting to be delivered by the outbox worker."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # contact_notification, investor_confirmation, etc.
+    to_email = db.Column(db.String(255), nullable=False)
+    from_email = db.Column(db.String(255), nullable=True)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(Text, nullable=False)
+    text_content = db.Column(Text, nullable=True)  # Plain-text alternative
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, dead, digest, digested
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(Text, nullable=True)
+    email_id = db.Column(db.String(100), nullable=True)  # Provider message ID once sent
+    batch_key = db.Column(db.String(40), nullable=True)  # Idempotency key of the batch this row is sent in
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'to_email': self.to_email,
+            'from_email': self.from_email,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'email_id': self.email_id,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class EmailCampaign(db.Model):
+    """Model for a bulk email sent to a segment of investors or contacts."""
+    __tablename__ = 'email_campaigns'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    segment = db.Column(db.String(50), nullable=False)  # e.g. investors:pending, contacts:all
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(Text, nullable=False)
+    from_email = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, running, completed, cancelled, failed
+    total = db.Column(db.Integer, default=0, nullable=False)  # Recipients in the segment when queued
+    sent = db.Column(db.Integer, default=0, nullable=False)
+    failed = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(Text, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Last progress write by the running worker
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'segment': self.segment,
+            'subject': self.subject,
+            'status': self.status,
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'last_error': self.last_error,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class CampaignRecipient(db.Model):
+    """Model for the delivery result of a campaign to one recipient."""
+    __tablename__ = 'campaign_recipients'
+    __table_args__ = (
+        db.UniqueConstraint('campaign_id', 'email', name='uq_campaign_recipients_campaign_id_email'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('email_campaigns.id', ondelete='CASCADE'), nullable=False)
+    recipient_id = db.Column(db.Integer, nullable=True)  # InvestorBooking / ContactMessage ID
+    email = db.Column(db.String(255), nullable=False)  # Lowercased
+    status = db.Column(db.String(20), nullable=False)  # sent, failed
+    email_id = db.Column(db.String(100), nullable=True)  # Provider message ID once sent
+    error = db.Column(Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'campaign_id': self.campaign_id,
+            'recipient_id': self.recipient_id,
+            'email': self.email,
+            'status': self.status,
+            'email_id': self.email_id,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class RateLimitWindow(db.Model):
+    """Model for a rate limit shared across processes: calls used in the current window (see email_campaigns.DatabaseRateLimiter)."""
+    __tablename__ = 'rate_limit_windows'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    window_start = db.Column(db.BigInteger, nullable=False)  # Window number (epoch seconds / window length)
+    used = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,269 @@
+"""Storage backends for uploaded media: Cloudinary, or a directory on local disk."""
+import os
+import re
+import uuid
+import shutil
+import threading
+import logging
+from abc import ABC, abstractmethod
+from cloudinary_service import get_cloudinary_service, get_file_type, get_resource_type, new_public_id, file_sha256
+
+logger = logging.getLogger(__name__)
+
+class StorageBackend(ABC):
+    """
+    Base class for storage backends.
+
+    Upload methods return the same result dicts as CloudinaryService:
+    {'success': True, 'url', 'public_id', 'bytes', 'resource_type', ...} or
+    {'success': False, 'error'}.
+    """
+
+    name = 'base'
+    # Whether browsers can upload straight to the backend (see CloudinaryService.sign_upload)
+    supports_direct_upload = False
+
+    def get_file_type(self, filename):
+        """Determine file type ('image', 'video', 'pdf' or 'other') from filename."""
+        return get_file_type(filename)
+
+    def get_resource_type(self, filename):
+        """Get the resource type ('image', 'video' or 'raw') for a filename."""
+        return get_resource_type(filename)
+
+    @abstractmethod
+    def save(self, file, folder='uploads/files', **options):
+        """
+        Store an uploaded file.
+
+        Args:
+            file: File object, werkzeug FileStorage or file path
+            folder: Folder to store it in
+        """
+
+    def save_many(self, files, folder='uploads/files', **options):
+        """Store several files; returns one result per file, in order."""
+        return [self.save(file, folder=folder, **options) for file in files]
+
+    @abstractmethod
+    def save_stream(self, stream, filename, folder='uploads/files', file_size=None, resume=None):
+        """
+        Store a raw request body without buffering it.
+
+        Failed results carry a 'resume' token; pass it back with the rest of
+        the stream (from resume['offset']) to continue.
+        """
+
+    @abstractmethod
+    def delete(self, public_id, resource_type='image'):
+        """Delete a stored file; returns {'success': ...}."""
+
+    def delete_many(self, public_ids, resource_type='image'):
+        """
+        Delete several stored files.
+
+        Returns:
+            dict with 'success', 'deleted' (IDs now gone) and 'failed' (ID -> error)
+        """
+        deleted = []
+        failed = {}
+        for public_id in public_ids:
+            result = self.delete(public_id, resource_type=resource_type)
+            if result.get('success'):
+                deleted.append(public_id)
+            else:
+                failed[public_id] = result.get('error', 'Unknown error')
+        return {'success': not failed, 'deleted': deleted, 'failed': failed}
+
+    @classmethod
+    @abstractmethod
+    def owns_url(cls, url):
+        """Check whether a stored URL points at this backend."""
+
+class CloudinaryStorage(StorageBackend):
+    """Files on Cloudinary (the default)."""
+
+    name = 'cloudinary'
+    supports_direct_upload = True
+
+    @property
+    def service(self):
+        return get_cloudinary_service()
+
+    def save(self, file, folder='uploads/files', **options):
+        return self.service.upload_file(file, folder=folder, **options)
+
+    def save_many(self, files, folder='uploads/files', **options):
+        return self.service.upload_files(files, folder=folder, **options)
+
+    def save_stream(self, stream, filename, folder='uploads/files', file_size=None, resume=None):
+        return self.service.upload_large(
+            stream,
+            folder=folder,
+            resource_type=self.get_resource_type(filename),
+            file_size=file_size,
+            filename=filename,
+            resume=resume
+        )
+
+    def delete(self, public_id, resource_type='image'):
+        return self.service.delete_file(public_id, resource_type=resource_type)
+
+    def delete_many(self, public_ids, resource_type='image'):
+        return self.service.delete_files(public_ids, resource_type=resource_type)
+
+    @classmethod
+    def owns_url(cls, url):
+        return '//res.cloudinary.com/' in (url or '')
+
+class LocalStorage(StorageBackend):
+    """
+    Files in a local directory, served by the app under /media/.
+
+    For staging without external services and for benchmarking uploads.
+    Stored files are never overwritten (every public ID is unique), so they
+    are served with immutable caching; see the media route in app.py.
+    """
+
+    name = 'local'
+    url_prefix = '/media/'
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root: Storage directory (defaults to MEDIA_ROOT or data/media)
+        """
+        self.root = os.path.abspath(root or os.getenv('MEDIA_ROOT', os.path.join('data', 'media')))
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, public_id):
+        """Get the filesystem path of a public ID, refusing paths outside the storage root."""
+        path = os.path.abspath(os.path.join(self.root, public_id))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid public ID: {public_id}")
+        return path
+
+    def _result(self, public_id, filename, size, content_hash=None):
+        """Build an upload result like CloudinaryService's."""
+        return {
+            'success': True,
+            'url': self.url_prefix + public_id,
+            'public_id': public_id,
+            'format': os.path.splitext(public_id)[1].lstrip('.') or None,
+            'bytes': size,
+            'resource_type': self.get_resource_type(filename),
+            'content_hash': content_hash
+        }
+
+    def save(self, file, folder='uploads/files', **options):
+        try:
+            filename = file if isinstance(file, str) else getattr(file, 'filename', None) or 'file'
+            # Keep the extension in the ID (like Cloudinary raw assets) so the file is served with its type
+            public_id = f"{folder}/{new_public_id(os.path.basename(filename), 'raw')}"
+            path = self.path(public_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            if isinstance(file, str):
+                shutil.copyfile(file, temp_path)
+            else:
+                stream = getattr(file, 'stream', file)
+                with open(temp_path, 'wb') as f:
+                    shutil.copyfileobj(stream, f, 1024 * 1024)
+            os.replace(temp_path, path)
+
+            return self._result(public_id, filename, os.path.getsize(path))
+
+        except Exception as e:
+            logger.error(f"Error storing file locally: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def save_stream(self, stream, filename, folder='uploads/files', file_size=None, resume=None):
+        resume = dict(resume or {
+            'upload_id': uuid.uuid4().hex,
+            'public_id': f"{folder}/{new_public_id(filename, 'raw')}",
+            'offset': 0
+        })
+        try:
+            if not re.fullmatch(r'[0-9a-f]{32}', str(resume.get('upload_id'))):
+                raise ValueError("Invalid resume token")
+            path = self.path(resume['public_id'])
+            part_path = f"{path}.{resume['upload_id']}.part"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Resume from what actually reached the disk, dropping anything past the client's offset
+            with open(part_path, 'ab') as f:
+                if f.tell() < resume['offset']:
+                    raise ValueError(f"Cannot resume at byte {resume['offset']}, only {f.tell()} were stored")
+                f.truncate(resume['offset'])
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    f.write(chunk)
+                    resume['offset'] = f.tell()
+
+            size = os.path.getsize(part_path)
+            if file_size and size < file_size:
+                raise IOError(f"Upload interrupted after {size} of {file_size} bytes")
+            if os.path.exists(path):
+                raise ValueError(f"{resume['public_id']} already exists")
+            os.replace(part_path, path)
+
+            return self._result(resume['public_id'], filename, size, content_hash=file_sha256(path))
+
+        except Exception as e:
+            logger.error(f"Error storing stream locally: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'resume': resume
+            }
+
+    def delete(self, public_id, resource_type='image'):
+        try:
+            os.remove(self.path(public_id))
+            return {'success': True}
+        except FileNotFoundError:
+            return {'success': True}  # Already gone
+        except Exception as e:
+            logger.error(f"Error deleting local file: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    @classmethod
+    def owns_url(cls, url):
+        return (url or '').startswith(cls.url_prefix)
+
+STORAGE_BACKENDS = {
+    'cloudinary': CloudinaryStorage,
+    'local': LocalStorage
+}
+
+# Global instances
+_storages = {}
+_storages_lock = threading.Lock()
+
+def get_storage(name=None):
+    """
+    Get the storage backend selected by STORAGE_BACKEND.
+
+    Args:
+        name: 'cloudinary' (default) or 'local'
+    """
+    name = (name or os.getenv('STORAGE_BACKEND', 'cloudinary')).lower()
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{name}' (expected one of {', '.join(STORAGE_BACKENDS)})")
+    with _storages_lock:
+        if name not in _storages:
+            _storages[name] = STORAGE_BACKENDS[name]()
+        return _storages[name]
+
+def get_storage_for_url(url):
+    """Get the backend a stored URL belongs to (e.g. to delete it after switching backends)."""
+    for name, backend in STORAGE_BACKENDS.items():
+        if backend.owns_url(url):
+            return get_storage(name)
+    return None